@@ -2,25 +2,41 @@ from PyQt6.QtWidgets import QApplication, QMenu, QSystemTrayIcon, QVBoxLayout, Q
 from PyQt6.QtGui import QIcon, QColor
 from PyQt6.QtCore import Qt, pyqtSignal
 import webbrowser
-import win32gui
-import win32api
-import win32con
-import ctypes
-import ctypes.wintypes
 import os
 import json
 import sys
 
-WinEventProcType = ctypes.WINFUNCTYPE(
-    None, 
-    ctypes.wintypes.HANDLE,
-    ctypes.wintypes.DWORD,
-    ctypes.wintypes.HWND,
-    ctypes.wintypes.LONG,
-    ctypes.wintypes.LONG,
-    ctypes.wintypes.DWORD,
-    ctypes.wintypes.DWORD
-)
+def create_backend():
+    """
+    Create the windowing backend for the current platform.
+
+    The backend modules are imported here so that each platform only needs its own dependencies.
+    On an unsupported platform, or if there is no X server to connect to, an error is printed and the program exits.
+
+    Args:
+        None
+
+    Returns:
+        object: A Win32Backend on Windows, or an X11Backend on Linux.
+    """
+    if sys.platform == "win32":
+        from win32_backend import Win32Backend
+        return Win32Backend()
+
+    # python-xlib is only installed on Linux, so other platforms have no backend yet
+    if not sys.platform.startswith("linux"):
+        print("====================================")
+        print("Unsupported platform: " + sys.platform)
+        print("Focus currently supports Windows and Linux desktops running X11.")
+        print("====================================")
+        sys.exit(1)
+
+    from x11_backend import X11Backend, CONNECTION_ERRORS, exit_on_connection_error
+
+    try:
+        return X11Backend()
+    except CONNECTION_ERRORS as e:
+        exit_on_connection_error(None, e)
 
 class ConfigDialog(QDialog):
     """
@@ -294,32 +310,36 @@ class FocusApp(QApplication):
     The main application class for the Focus application.
     """
 
-    def __init__(self, *args):
+    def __init__(self, *args, backend=None):
         """
         Initialize the FocusApp.
 
         Args:
             args: The arguments passed to the application.
+            backend (object): The windowing backend used to dim windows. Defaults to the backend for the current platform.
 
         Returns:
             None
         """
         super().__init__(*args)
 
+        # Use the windowing backend passed in, or the one for the current platform
+        self.backend = backend if backend is not None else create_backend()
+
         # Set the app name
         self.setApplicationName("Focus")
 
         # Set the app style to Windows Vista
-        self.setStyle("WindowsVista")
+        if sys.platform == "win32":
+            self.setStyle("WindowsVista")
 
         # Set default transparency values
         self.transparency_max = 255
         self.transparency_dim = 0.5 * self.transparency_max
         self.transparency_default = 1.0 * self.transparency_max
 
-        # Set default tint values
+        # Set default tint value
         self.tint_color = 0x00000080
-        self.tint_default = 0x00000000
 
         # Set the config file path to the users home directory
         self.config_file_path = os.path.join(os.path.expanduser("~"), ".focus_config.json")
@@ -412,11 +432,8 @@ class FocusApp(QApplication):
         # Show the system tray icon
         self.tray_icon.show()
 
-        # Use WinEventProcType to create a callback function that receives notifications
-        self.WinEventProc = WinEventProcType(self.active_window_change_callback)
-
-        # Use user32.SetWinEventHook to hook to the active window change callback
-        ctypes.windll.user32.SetWinEventHook(win32con.EVENT_OBJECT_FOCUS, win32con.EVENT_OBJECT_FOCUS, None, self.WinEventProc, 0, 0, win32con.WINEVENT_OUTOFCONTEXT | win32con.WINEVENT_SKIPOWNPROCESS)
+        # Have the backend call the active window change callback
+        self.backend.start(self.active_window_change_callback)
 
     def dim_action(self):
         """
@@ -447,9 +464,8 @@ class FocusApp(QApplication):
         """
         Dim the inactive windows on the screen.
 
-        This method gets the handle of the active window and then dims all the other visible windows
-        except for the taskbar, start menu, and the active window itself. It sets the WS_EX_LAYERED
-        extended style for each window and applies transparency and tint color to achieve the dimming effect.
+        This method has the backend dim all the other visible windows except for the taskbar, start menu,
+        and the active window itself using the configured transparency and tint color.
 
         Args:
             None
@@ -458,47 +474,10 @@ class FocusApp(QApplication):
             None
         """
 
-        # Get the handle of the active window
-        active_window = win32gui.GetForegroundWindow()
-
         print("Dimming inactive windows")
 
         if self.bDim:
-            self.undim_active_window()
-
-            # Enumerate all top-level windows
-            def enum_dim_callback(hwnd, _):
-                # Skip the active window
-                if hwnd != active_window:
-
-                    # Make sure hwnd is not null
-                    if hwnd is not None:
-                        
-                        # Make sure the window is visible
-                        if win32gui.IsWindowVisible(hwnd) != 0 and win32gui.IsIconic(hwnd) == 0:
-
-                            # Make sure the window is not the taskbar or the start menu
-                            if win32gui.GetClassName(hwnd) != "Shell_TrayWnd" and win32gui.GetClassName(hwnd) != "Button" and win32gui.GetClassName(hwnd) != "Windows.UI.Core.CoreWindow":
-
-                                # Check whether WS_EX_LAYERED is set
-                                if win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE) & win32con.WS_EX_LAYERED == 0:
-                                    # Use ctypes.windll.user32.SetWindowLongPtrW to make sure WS_EX_LAYERED is set
-                                    ctypes.windll.user32.SetWindowLongPtrW(hwnd, win32con.GWL_EXSTYLE,
-                                                                    ctypes.windll.user32.GetWindowLongPtrW(hwnd, win32con.GWL_EXSTYLE) | win32con.WS_EX_LAYERED)
-                                
-                                # Check whether WS_EX_LAYERED is set
-                                if win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE) & win32con.WS_EX_LAYERED != 0:
-                                    
-                                    #print("Dimming window (hwnd: " + str(hwnd) + ")")
-                                    #print("Transparency: " + str(self.transparency_dim) + ", Tint: " + str(hex(self.tint_color)))
-                                    flags = win32con.LWA_COLORKEY | win32con.LWA_ALPHA
-
-                                    if win32gui.SetLayeredWindowAttributes(hwnd, self.tint_color, int(self.transparency_dim), flags) == 0:
-                                        print("Error setting layered window attributes (hwnd: " + str(hwnd) + ")")
-                                        print("Error: " + str(win32api.GetLastError()))
-                                    win32gui.RedrawWindow(hwnd, None, None, win32con.RDW_ERASE | win32con.RDW_INVALIDATE | win32con.RDW_FRAME | win32con.RDW_ALLCHILDREN)
-
-            win32gui.EnumWindows(enum_dim_callback, None)
+            self.backend.dim_inactive_windows(self.tint_color, int(self.transparency_dim), int(self.transparency_default))
 
     def undim_action(self):
         """
@@ -684,11 +663,9 @@ class FocusApp(QApplication):
  
     def undim_all_windows(self):
         """
-        Undims all windows by setting the WS_EX_LAYERED extended window style and adjusting the transparency.
+        Undims all windows by restoring the default transparency.
 
-        This method enumerates all top-level windows and checks if they are visible and not minimized.
-        If a window does not have the WS_EX_LAYERED style set, it sets the style using SetWindowLongPtrW.
-        Then, it adjusts the transparency of the window using SetLayeredWindowAttributes and redraws the window.
+        This method has the backend restore every visible, non-minimized window to the default transparency.
 
         Args:
             self (object): The instance of the class.
@@ -699,76 +676,19 @@ class FocusApp(QApplication):
         print("Undimming all windows")
 
         if not self.bDim:
+            self.backend.undim_all_windows(self.tint_color, int(self.transparency_default))
 
-            # Enumerate all top-level windows
-            def enum_undim_callback(hwnd, _):
-
-                # Make sure hwnd is not null
-                if hwnd is not None:
-
-                    # Make sure the window is visible
-                    if win32gui.IsWindowVisible(hwnd) != 0 and win32gui.IsIconic(hwnd) == 0:
-
-                        # Check whether WS_EX_LAYERED is set
-                        if win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE) & win32con.WS_EX_LAYERED == 0:
-
-                            print("Setting WS_EX_LAYERED (hwnd: " + str(hwnd) + ")" )
-
-                            # Use ctypes.windll.user32.SetWindowLongPtrW to make sure WS_EX_LAYERED is set
-                            ctypes.windll.user32.SetWindowLongPtrW(hwnd, win32con.GWL_EXSTYLE,
-                                                                ctypes.windll.user32.GetWindowLongPtrW(hwnd, win32con.GWL_EXSTYLE) | win32con.WS_EX_LAYERED)
-                            
-                        # Verify WS_EX_LAYERED is set
-                        if win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE) & win32con.WS_EX_LAYERED != 0:
-                            
-                            #print("Undimming window (hwnd: " + str(hwnd) + ")")
-                            
-                            win32gui.SetLayeredWindowAttributes(hwnd, self.tint_color, int(self.transparency_default), win32con.LWA_ALPHA | win32con.LWA_COLORKEY)
-                            win32gui.RedrawWindow(hwnd, None, None, win32con.RDW_ERASE | win32con.RDW_INVALIDATE | win32con.RDW_FRAME | win32con.RDW_ALLCHILDREN)
-
-            win32gui.EnumWindows(enum_undim_callback, None)
-
-    def undim_active_window(self):
+    def active_window_change_callback(self):
         """
-        Undims the active window by setting the transparency level to the default value.
-
-        This function gets the handle of the active window, sets the WS_EX_LAYERED style using SetWindowLongPtrW,
-        and then sets the transparency level using SetLayeredWindowAttributes.
+        Callback function triggered by the backend when the active window changes.
 
         Args:
             None
 
-        Returns:
-            None
-        """
-        # Get the hwnd of the active window
-        hwnd = win32gui.GetForegroundWindow()
-
-        # Use ctypes.windll.user32.SetWindowLongPtrW to make sure WS_EX_LAYERED is set
-        ctypes.windll.user32.SetWindowLongPtrW(hwnd, win32con.GWL_EXSTYLE,
-                        ctypes.windll.user32.GetWindowLongPtrW(hwnd, win32con.GWL_EXSTYLE) | win32con.WS_EX_LAYERED)
-
-        win32gui.SetLayeredWindowAttributes(hwnd, self.tint_default, int(self.transparency_default), win32con.LWA_ALPHA)
-
-    def active_window_change_callback(self, hWinEventHook, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime):
-        """
-        Callback function triggered when the active window changes.
-
-        Args:
-            hWinEventHook (int): The handle to the event hook.
-            event (int): The event that occurred.
-            hwnd (int): The handle to the window that triggered the event.
-            idObject (int): The identifier of the object associated with the event.
-            idChild (int): The identifier of the child object associated with the event.
-            dwEventThread (int): The identifier of the thread that triggered the event.
-            dwmsEventTime (int): The timestamp of the event.
-
         Returns:
             None
         """
 
-        #print("Active window changed (hwnd: " + str(hwnd) + ")")
-
         # Dim all windows except the active window
         if self.bDim:
             self.dim_inactive_windows()
@@ -778,8 +698,8 @@ class FocusApp(QApplication):
         """
         Perform the exit action.
 
-        This method is called when the exit option is selected. It undims all windows to clean up
-        and then exits the program.
+        This method is called when the exit option is selected. It undims all windows to clean up,
+        waits for the backend to finish any undims it could not make right away, and then exits the program.
 
         Args:
             None
@@ -790,6 +710,9 @@ class FocusApp(QApplication):
         print("Exit option selected")
         # Undim all Windows to clean up
         self.undim_action()
+
+        # Wait for undims of hung and slow windows, which the backend makes on worker threads
+        self.backend.shutdown(5.0)
         sys.exit()
 
 if __name__ == "__main__":
@@ -0,0 +1,444 @@
+"""
+Long-running soak harness for Focus.
+
+Drives millions of simulated focus events, window and dialog create/destroy cycles, cloak/uncloak cycles and
+hung/responsive cycles through FocusApp and the Windows backend, with user32 and dwmapi replaced by a simulated
+desktop. The simulated library is built from real ctypes function pointers, so every call goes through the same
+argument marshalling and callback paths as on Windows.
+
+Memory is tracked with tracemalloc and the number of live objects with gc. Growth is reported for every 100k
+events, and the run fails if it keeps growing past the allowed limit once the app has warmed up.
+
+Run `python soak.py --help` for the available options. Qt is started with the offscreen platform unless
+QT_QPA_PLATFORM is already set.
+"""
+import argparse
+import contextlib
+import ctypes
+import ctypes.wintypes
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import winapi
+
+class SimulatedDesktop:
+    """
+    A simulated desktop that stands in for user32.dll and dwmapi.dll.
+    """
+
+    def __init__(self, window_count):
+        """
+        Initialize the SimulatedDesktop with a taskbar and a number of ordinary windows.
+
+        Args:
+            window_count (int): The number of ordinary windows to create.
+
+        Returns:
+            None
+        """
+        # Window handles are never reused, so state kept for destroyed windows shows up as growth
+        self.next_hwnd = 0x10000
+        self.windows = {}
+        self.foreground = None
+        self.win_event_procs = []
+
+        # Keep the exported function pointers alive for as long as the desktop exists
+        self.exports = {}
+
+        self.export("GetForegroundWindow", ctypes.wintypes.HWND, [], self.GetForegroundWindow)
+        self.export("IsWindowVisible", ctypes.wintypes.BOOL, [ctypes.wintypes.HWND], self.IsWindowVisible)
+        self.export("IsIconic", ctypes.wintypes.BOOL, [ctypes.wintypes.HWND], self.IsIconic)
+        self.export("GetAncestor", ctypes.wintypes.HWND, [ctypes.wintypes.HWND, ctypes.wintypes.UINT], self.GetAncestor)
+        self.export("GetClassNameW", ctypes.c_int, [ctypes.wintypes.HWND, ctypes.c_void_p, ctypes.c_int], self.GetClassNameW)
+        self.export("GetWindowLongPtrW", winapi.LONG_PTR, [ctypes.wintypes.HWND, ctypes.c_int], self.GetWindowLongPtrW)
+        self.export("SetWindowLongPtrW", winapi.LONG_PTR, [ctypes.wintypes.HWND, ctypes.c_int, winapi.LONG_PTR], self.SetWindowLongPtrW)
+        self.export("IsHungAppWindow", ctypes.wintypes.BOOL, [ctypes.wintypes.HWND], self.IsHungAppWindow)
+        self.export("SendMessageTimeoutW", winapi.LONG_PTR,
+                    [ctypes.wintypes.HWND, ctypes.wintypes.UINT, ctypes.wintypes.WPARAM, ctypes.wintypes.LPARAM,
+                     ctypes.wintypes.UINT, ctypes.wintypes.UINT, ctypes.c_void_p], self.SendMessageTimeoutW)
+        self.export("SetLayeredWindowAttributes", ctypes.wintypes.BOOL,
+                    [ctypes.wintypes.HWND, ctypes.wintypes.DWORD, ctypes.c_ubyte, ctypes.wintypes.DWORD], self.SetLayeredWindowAttributes)
+        self.export("RedrawWindow", ctypes.wintypes.BOOL,
+                    [ctypes.wintypes.HWND, ctypes.c_void_p, ctypes.wintypes.HRGN, ctypes.wintypes.UINT], self.RedrawWindow)
+        self.export("EnumWindows", ctypes.wintypes.BOOL, [winapi.WndEnumProcType, ctypes.wintypes.LPARAM], self.EnumWindows)
+        self.export("SetWinEventHook", ctypes.wintypes.HANDLE,
+                    [ctypes.wintypes.DWORD, ctypes.wintypes.DWORD, ctypes.wintypes.HMODULE, winapi.WinEventProcType,
+                     ctypes.wintypes.DWORD, ctypes.wintypes.DWORD, ctypes.wintypes.DWORD], self.SetWinEventHook)
+        self.export("DwmGetWindowAttribute", ctypes.c_long,
+                    [ctypes.wintypes.HWND, ctypes.wintypes.DWORD, ctypes.c_void_p, ctypes.wintypes.DWORD], self.DwmGetWindowAttribute)
+
+        # Create the taskbar and the ordinary windows
+        self.create_window("Shell_TrayWnd")
+        for _ in range(window_count):
+            self.create_window()
+
+    def export(self, name, restype, argtypes, function):
+        """
+        Expose a Python function as a ctypes function pointer attribute, the way ctypes.WinDLL exposes exports.
+
+        Args:
+            name (str): The export name.
+            restype (type): The ctypes return type.
+            argtypes (list): The ctypes argument types.
+            function (callable): The implementation.
+
+        Returns:
+            None
+        """
+        pointer = winapi.FUNCTYPE(restype, *argtypes)(function)
+        self.exports[name] = pointer
+        setattr(self, name, pointer)
+
+    def create_window(self, class_name="SimulatedWindow", owner=None):
+        """
+        Create a visible top-level window at the top of the Z order.
+
+        Args:
+            class_name (str): The window class name.
+            owner (int): The owner window handle, or None for an unowned window.
+
+        Returns:
+            int: The new window handle.
+        """
+        self.next_hwnd += 4
+        hwnd = self.next_hwnd
+        self.windows[hwnd] = {"class_name": class_name, "visible": True, "iconic": False, "ex_style": 0, "alpha": 255, "cloaked": False, "hung": False, "owner": owner}
+        return hwnd
+
+    def destroy_window(self, hwnd):
+        """
+        Destroy a window and every window it owns.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        del self.windows[hwnd]
+
+        for owned in [owned for owned, window in self.windows.items() if window["owner"] == hwnd]:
+            self.destroy_window(owned)
+
+        if self.foreground == hwnd:
+            self.foreground = None
+
+    def find_windows(self, class_name):
+        """
+        Find every window of a class.
+
+        Args:
+            class_name (str): The window class name.
+
+        Returns:
+            list: The window handles.
+        """
+        return [hwnd for hwnd, window in self.windows.items() if window["class_name"] == class_name]
+
+    def focus(self, hwnd):
+        """
+        Bring a window to the foreground and send EVENT_OBJECT_FOCUS to every hook.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        self.foreground = hwnd
+
+        self.send_event(winapi.EVENT_OBJECT_FOCUS, hwnd)
+
+    def toggle_cloak(self, hwnd):
+        """
+        Cloak or uncloak a window, the way switching virtual desktops does, and send the matching event.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        cloaked = not self.windows[hwnd]["cloaked"]
+        self.windows[hwnd]["cloaked"] = cloaked
+        self.send_event(winapi.EVENT_OBJECT_CLOAKED if cloaked else winapi.EVENT_OBJECT_UNCLOAKED, hwnd)
+
+    def toggle_hung(self, hwnd):
+        """
+        Make a window stop or start responding to messages.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        self.windows[hwnd]["hung"] = not self.windows[hwnd]["hung"]
+
+    def send_event(self, event, hwnd):
+        """
+        Send a WinEvent for a window to every hook that covers it.
+
+        Args:
+            event (int): The event.
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        for event_min, event_max, proc in self.win_event_procs:
+            if event_min <= event <= event_max:
+                proc(1, event, hwnd, winapi.OBJID_WINDOW, winapi.CHILDID_SELF, 0, 0)
+
+    def GetForegroundWindow(self):
+        return self.foreground or 0
+
+    def IsWindowVisible(self, hwnd):
+        return hwnd in self.windows and self.windows[hwnd]["visible"]
+
+    def IsIconic(self, hwnd):
+        return hwnd in self.windows and self.windows[hwnd]["iconic"]
+
+    def GetAncestor(self, hwnd, flags):
+        if hwnd not in self.windows or flags != winapi.GA_ROOTOWNER:
+            return 0
+
+        while self.windows[hwnd]["owner"] is not None:
+            hwnd = self.windows[hwnd]["owner"]
+        return hwnd
+
+    def GetClassNameW(self, hwnd, buffer, length):
+        if hwnd not in self.windows:
+            return 0
+
+        class_name = self.windows[hwnd]["class_name"][:length - 1]
+        ctypes.memmove(buffer, ctypes.create_unicode_buffer(class_name), (len(class_name) + 1) * ctypes.sizeof(ctypes.c_wchar))
+        return len(class_name)
+
+    # The functions below are also called from the backend's worker threads while windows are being destroyed
+
+    def GetWindowLongPtrW(self, hwnd, index):
+        window = self.windows.get(hwnd)
+        return window["ex_style"] if window is not None and index == winapi.GWL_EXSTYLE else 0
+
+    def SetWindowLongPtrW(self, hwnd, index, value):
+        window = self.windows.get(hwnd)
+        if window is None or index != winapi.GWL_EXSTYLE:
+            return 0
+
+        previous = window["ex_style"]
+        window["ex_style"] = value
+        return previous
+
+    def IsHungAppWindow(self, hwnd):
+        window = self.windows.get(hwnd)
+        return window is not None and window["hung"]
+
+    def SendMessageTimeoutW(self, hwnd, message, wparam, lparam, flags, timeout, result):
+        window = self.windows.get(hwnd)
+        return 1 if window is not None and not window["hung"] else 0
+
+    def SetLayeredWindowAttributes(self, hwnd, color_key, alpha, flags):
+        window = self.windows.get(hwnd)
+        if window is None or window["ex_style"] & winapi.WS_EX_LAYERED == 0:
+            return 0
+
+        window["alpha"] = alpha
+        return 1
+
+    def RedrawWindow(self, hwnd, rect, region, flags):
+        return hwnd in self.windows
+
+    def EnumWindows(self, proc, lparam):
+        for hwnd in sorted(self.windows, reverse=True):
+            if not proc(hwnd, lparam):
+                break
+        return 1
+
+    def SetWinEventHook(self, event_min, event_max, module, proc, process_id, thread_id, flags):
+        self.win_event_procs.append((event_min, event_max, proc))
+        return len(self.win_event_procs)
+
+    def DwmGetWindowAttribute(self, hwnd, attribute, value, size):
+        if hwnd not in self.windows or attribute != winapi.DWMWA_CLOAKED or size != ctypes.sizeof(ctypes.wintypes.DWORD):
+            return -2147024809
+
+        ctypes.wintypes.DWORD.from_address(value).value = 1 if self.windows[hwnd]["cloaked"] else 0
+        return 0
+
+def measure():
+    """
+    Collect garbage and measure the traced memory, the number of live objects and the memory held by each source line.
+
+    The tracemalloc snapshot is reduced to plain sizes and dropped before returning, so that keeping the previous
+    measurement around does not add to the live object count.
+
+    Args:
+        None
+
+    Returns:
+        tuple: The traced memory in bytes, the number of live objects, and a dict of bytes allocated per source line.
+    """
+    gc.collect()
+    objects = len(gc.get_objects())
+    memory = tracemalloc.get_traced_memory()[0]
+    sizes = {str(stat.traceback): stat.size for stat in tracemalloc.take_snapshot().statistics("lineno")}
+    return memory, objects, sizes
+
+def run_soak(events, window_count, churn_every, cloak_every, hang_every, warmup, max_memory_growth, max_object_growth, seed):
+    """
+    Drive simulated focus events and window churn through FocusApp and check for unbounded growth.
+
+    Args:
+        events (int): The number of focus events to send.
+        window_count (int): The number of ordinary windows kept on the simulated desktop.
+        churn_every (int): Destroy one window and create another every this many events.
+        cloak_every (int): Cloak or uncloak one window every this many events.
+        hang_every (int): Make one window hang or recover every this many events.
+        warmup (int): The number of events to run before taking the baseline measurement.
+        max_memory_growth (int): The allowed traced memory growth in bytes per 100k events after warmup.
+        max_object_growth (int): The allowed live object growth per 100k events after warmup.
+        seed (int): The random seed used to pick windows.
+
+    Returns:
+        bool: True if growth stayed within the limits.
+    """
+    # Import the app here so that QT_QPA_PLATFORM is set before Qt loads
+    from focus import FocusApp
+    from win32_backend import Win32Backend
+
+    interval = 100000
+    rng = random.Random(seed)
+    desktop = SimulatedDesktop(window_count)
+
+    # The app reads and creates its config file in the home directory when it starts, so give it an empty home
+    # directory for the run. The default settings are used and the user's config file is left alone.
+    home = tempfile.TemporaryDirectory()
+    saved_environ = {name: os.environ.get(name) for name in ("HOME", "USERPROFILE")}
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home.name
+
+    # The app prints on every pass, so keep its output out of the report
+    devnull = open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(devnull):
+            app = FocusApp(sys.argv[:1], backend=Win32Backend(winapi.User32(desktop), winapi.Dwmapi(desktop)))
+    finally:
+        for name, value in saved_environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    tracemalloc.start()
+
+    def send_events(count):
+        with contextlib.redirect_stdout(devnull):
+            for i in range(count):
+                # Replace a window and a dialog every churn_every events
+                if i % churn_every == 0:
+                    desktop.destroy_window(rng.choice(desktop.find_windows("SimulatedWindow")))
+                    desktop.create_window()
+
+                    dialogs = desktop.find_windows("#32770")
+                    if dialogs:
+                        desktop.destroy_window(rng.choice(dialogs))
+                    desktop.create_window("#32770", owner=rng.choice(desktop.find_windows("SimulatedWindow")))
+
+                # Move a window to or from another virtual desktop every cloak_every events
+                if i % cloak_every == 0:
+                    desktop.toggle_cloak(rng.choice(list(desktop.windows)))
+
+                # Have a window stop or start responding every hang_every events
+                if i % hang_every == 0:
+                    desktop.toggle_hung(rng.choice(list(desktop.windows)))
+
+                desktop.focus(rng.choice(list(desktop.windows)))
+
+    print("Warming up for " + str(warmup) + " events")
+    send_events(warmup)
+
+    # Measure once first so that objects created lazily by the first snapshot are part of the baseline
+    measure()
+    baseline_memory, baseline_objects, previous_sizes = measure()
+
+    print("Sending " + str(events) + " events across " + str(window_count) + " windows")
+    print("events      memory (KiB)   delta (KiB)   objects   delta   events/s")
+
+    sent = 0
+    previous_memory = baseline_memory
+    previous_objects = baseline_objects
+
+    while sent < events:
+        count = min(interval, events - sent)
+        start = time.perf_counter()
+        send_events(count)
+        elapsed = time.perf_counter() - start
+        sent += count
+
+        memory, objects, sizes = measure()
+        print("{:<11} {:>12.1f} {:>13.1f} {:>9} {:>7} {:>10.0f}".format(
+            sent, memory / 1024, (memory - previous_memory) / 1024, objects, objects - previous_objects, count / elapsed))
+
+        # Show where memory is growing
+        growth = sorted(((size - previous_sizes.get(line, 0), line) for line, size in sizes.items()), reverse=True)
+        for size_diff, line in growth[:3]:
+            if size_diff > 0:
+                print("    " + line + ": +" + str(size_diff) + " B")
+
+        previous_memory = memory
+        previous_objects = objects
+        previous_sizes = sizes
+
+    tracemalloc.stop()
+    devnull.close()
+    home.cleanup()
+
+    # A fixed per-window footprint levels off after warmup, so any steady growth across the run is a leak
+    memory_growth = (previous_memory - baseline_memory) * interval / max(sent, 1)
+    object_growth = (previous_objects - baseline_objects) * interval / max(sent, 1)
+
+    print("====================================")
+    print("Memory growth per 100k events: " + "{:.1f}".format(memory_growth / 1024) + " KiB (limit: " + "{:.1f}".format(max_memory_growth / 1024) + " KiB)")
+    print("Object growth per 100k events: " + "{:.1f}".format(object_growth) + " (limit: " + str(max_object_growth) + ")")
+
+    app.quit()
+
+    return memory_growth <= max_memory_growth and object_growth <= max_object_growth
+
+def main():
+    """
+    Parse the command line and run the soak.
+
+    Args:
+        None
+
+    Returns:
+        int: The exit code. 0 if growth stayed within the limits, otherwise 1.
+    """
+    parser = argparse.ArgumentParser(description="Soak Focus with simulated focus events and window churn.")
+    parser.add_argument("--events", type=int, default=1000000, help="number of focus events to send")
+    parser.add_argument("--windows", type=int, default=20, help="number of ordinary windows on the simulated desktop")
+    parser.add_argument("--churn-every", type=int, default=10, help="replace a window every N events")
+    parser.add_argument("--cloak-every", type=int, default=7, help="cloak or uncloak a window every N events")
+    parser.add_argument("--hang-every", type=int, default=50, help="make a window hang or recover every N events")
+    parser.add_argument("--warmup", type=int, default=10000, help="events to send before the baseline measurement")
+    parser.add_argument("--max-memory-growth", type=int, default=64, help="allowed KiB of growth per 100k events")
+    parser.add_argument("--max-object-growth", type=int, default=100, help="allowed live objects of growth per 100k events")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    passed = run_soak(args.events, args.windows, args.churn_every, args.cloak_every, args.hang_every, args.warmup,
+                      args.max_memory_growth * 1024, args.max_object_growth, args.seed)
+
+    print("PASS" if passed else "FAIL: memory or object count keeps growing")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
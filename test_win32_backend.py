@@ -0,0 +1,343 @@
+"""
+Tests for the Windows backend, run against the simulated desktop from the soak harness.
+
+Run `python -m unittest test_win32_backend` or `python -m pytest`.
+"""
+import contextlib
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+
+import win32_backend
+import winapi
+from soak import SimulatedDesktop
+
+class FaultyDesktop(SimulatedDesktop):
+    """
+    A simulated desktop with windows that are slow to change or that block while their style is set.
+    """
+
+    def __init__(self, window_count):
+        """
+        Initialize the FaultyDesktop.
+
+        Args:
+            window_count (int): The number of ordinary windows to create.
+
+        Returns:
+            None
+        """
+        # Windows whose SetLayeredWindowAttributes takes slow_seconds, and the threads each window was changed on
+        self.slow = set()
+        self.slow_seconds = 0.0
+        self.changed_on = {}
+
+        # Windows whose SetWindowLongPtrW blocks until release is set
+        self.blocking = set()
+        self.release = threading.Event()
+
+        super().__init__(window_count)
+
+    def SetWindowLongPtrW(self, hwnd, index, value):
+        if hwnd in self.blocking:
+            self.release.wait()
+        return super().SetWindowLongPtrW(hwnd, index, value)
+
+    def SetLayeredWindowAttributes(self, hwnd, color_key, alpha, flags):
+        self.changed_on.setdefault(hwnd, []).append(threading.current_thread())
+        if hwnd in self.slow:
+            time.sleep(self.slow_seconds)
+        return super().SetLayeredWindowAttributes(hwnd, color_key, alpha, flags)
+
+class BackendTestCase(unittest.TestCase):
+    """
+    Creates a backend on a fresh simulated desktop, with the backend's output kept out of the test report.
+    """
+
+    def setUp(self):
+        output = contextlib.redirect_stdout(io.StringIO())
+        output.__enter__()
+        self.addCleanup(output.__exit__, None, None, None)
+
+        self.desktop = FaultyDesktop(4)
+        self.addCleanup(self.desktop.release.set)
+        self.backend = win32_backend.Win32Backend(winapi.User32(self.desktop), winapi.Dwmapi(self.desktop))
+        self.windows = self.desktop.find_windows("SimulatedWindow")
+        self.desktop.foreground = self.windows[0]
+
+    def dim_pass(self, transparency_dim=128):
+        """
+        Run a dim pass and wait for the worker threads to finish it.
+
+        Args:
+            transparency_dim (int): The transparency of inactive windows.
+
+        Returns:
+            None
+        """
+        self.backend.dim_inactive_windows(0, transparency_dim, 255)
+        self.assertTrue(self.backend.shutdown(5.0))
+
+    def alpha(self, hwnd):
+        return self.desktop.windows[hwnd]["alpha"]
+
+    def make_due(self, hwnd):
+        with self.backend.lock:
+            self.backend.quarantine[hwnd] = (0.0, self.backend.quarantine[hwnd][1])
+
+    def start(self):
+        """
+        Start the backend with a callback that counts its calls and runs a dim pass, the way FocusApp does.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.callbacks = 0
+        self.transparency_dim = 128
+
+        def callback():
+            self.callbacks += 1
+            self.backend.dim_inactive_windows(0, self.transparency_dim, 255)
+
+        self.backend.start(callback)
+
+    def focus(self, hwnd):
+        """
+        Focus a window and wait for the worker threads to finish any pass it started.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        self.desktop.focus(hwnd)
+        self.assertTrue(self.backend.shutdown(5.0))
+
+class QuarantineTest(BackendTestCase):
+    """
+    Tests for hung windows, quarantine and the undim on exit.
+    """
+
+    def test_hung_window_backoff_doubles_up_to_the_limit(self):
+        hung = self.windows[1]
+        self.desktop.toggle_hung(hung)
+
+        self.dim_pass()
+        backoffs = [self.backend.quarantine[hung][1]]
+
+        for _ in range(7):
+            self.make_due(hung)
+            self.dim_pass()
+            backoffs.append(self.backend.quarantine[hung][1])
+
+        self.assertEqual(backoffs, [1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 60.0, 60.0])
+        self.assertEqual(self.alpha(hung), 255)
+
+        # The other windows are not held up by the hung one
+        self.assertEqual(self.alpha(self.windows[2]), 128)
+
+    def test_quarantined_window_is_skipped_until_due(self):
+        hung = self.windows[1]
+        self.desktop.toggle_hung(hung)
+        self.dim_pass()
+        retry = self.backend.quarantine[hung]
+
+        # Not due yet, so nothing is queued and the index keeps the last recorded change
+        self.backend.dim_inactive_windows(0, 100, 255)
+        self.assertNotIn(hung, self.backend.pending)
+        self.assertEqual(self.backend.quarantine[hung], retry)
+        self.assertEqual(self.backend.windows[hung], (win32_backend.WINDOW_DIMMED, 128))
+
+    def test_window_is_applied_once_it_responds(self):
+        hung = self.windows[1]
+        self.desktop.toggle_hung(hung)
+        self.dim_pass()
+
+        self.desktop.toggle_hung(hung)
+        self.make_due(hung)
+        self.dim_pass()
+
+        self.assertEqual(self.alpha(hung), 128)
+        self.assertNotIn(hung, self.backend.quarantine)
+
+    def test_undim_restores_a_recovered_quarantined_window(self):
+        window = self.windows[1]
+        self.dim_pass()
+
+        # Hang while dimmed, then recover before the retry is due
+        self.desktop.toggle_hung(window)
+        self.dim_pass(100)
+        self.assertIn(window, self.backend.quarantine)
+        self.desktop.toggle_hung(window)
+
+        self.backend.undim_all_windows(0, 255)
+        self.assertTrue(self.backend.shutdown(5.0))
+
+        self.assertEqual(self.alpha(window), 255)
+        self.assertEqual(self.backend.windows[window], (win32_backend.WINDOW_ACTIVE, 255))
+
+    def test_shutdown_waits_for_deferred_undims(self):
+        slow = self.windows[1]
+        self.desktop.slow.add(slow)
+        self.desktop.slow_seconds = 0.1
+        self.dim_pass()
+        self.assertIn(slow, self.backend.slow_windows)
+
+        self.backend.undim_all_windows(0, 255)
+        self.assertTrue(self.backend.shutdown(5.0))
+
+        self.assertEqual(self.alpha(slow), 255)
+
+class WorkerTest(BackendTestCase):
+    """
+    Tests for slow windows and workers that get stuck on a window.
+    """
+
+    @mock.patch.object(win32_backend, "SLOW_APPLY_SECONDS", 0.02)
+    def test_slow_window_stays_off_the_main_thread_until_a_worker_is_fast(self):
+        slow = self.windows[1]
+        self.desktop.slow.add(slow)
+        self.desktop.slow_seconds = 0.05
+        main_thread = threading.current_thread()
+
+        # The first change sets WS_EX_LAYERED, so a worker makes it and finds the window slow
+        self.dim_pass()
+        self.assertIn(slow, self.backend.slow_windows)
+
+        # Later passes keep the slow window on the workers
+        for transparency_dim in (100, 120):
+            self.desktop.changed_on[slow] = []
+            self.dim_pass(transparency_dim)
+            self.assertEqual(self.alpha(slow), transparency_dim)
+            self.assertNotIn(main_thread, self.desktop.changed_on[slow])
+            self.assertIn(slow, self.backend.slow_windows)
+
+        # A fast worker apply moves it back to the main thread
+        self.desktop.slow.clear()
+        self.dim_pass(110)
+        self.assertNotIn(slow, self.backend.slow_windows)
+
+        self.desktop.changed_on[slow] = []
+        self.dim_pass(130)
+        self.assertEqual(self.desktop.changed_on[slow], [main_thread])
+
+    @mock.patch.object(win32_backend, "APPLY_DEADLINE_SECONDS", 0.1)
+    def test_expired_change_replaces_its_stuck_worker(self):
+        stuck_window = self.windows[1]
+        self.desktop.blocking.add(stuck_window)
+
+        self.backend.dim_inactive_windows(0, 128, 255)
+
+        # Wait for a worker to block on the window
+        deadline = time.monotonic() + 5.0
+        stuck_worker = None
+        while stuck_worker is None and time.monotonic() < deadline:
+            with self.backend.lock:
+                stuck_worker = next((worker for worker, hwnd in self.backend.workers.items() if hwnd == stuck_window), None)
+            time.sleep(0.01)
+        self.assertIsNotNone(stuck_worker)
+
+        time.sleep(0.2)
+        self.backend.reap_stuck_workers()
+
+        self.assertIn(stuck_window, self.backend.quarantine)
+        self.assertNotIn(stuck_window, self.backend.pending)
+        self.assertNotIn(stuck_worker, self.backend.workers)
+        self.assertEqual(len(self.backend.workers), win32_backend.WORKER_COUNT)
+        self.assertEqual(self.backend.stuck_workers, 1)
+
+        # New windows are still dimmed by the replacement workers
+        new_window = self.desktop.create_window()
+        self.dim_pass()
+        self.assertEqual(self.alpha(new_window), 128)
+
+        # The abandoned worker exits once its call returns
+        self.desktop.release.set()
+        stuck_worker.join(5.0)
+        self.assertFalse(stuck_worker.is_alive())
+        self.assertEqual(self.backend.stuck_workers, 0)
+
+class CloakTest(BackendTestCase):
+    """
+    Tests for windows cloaked by DWM.
+    """
+
+    def test_uncloaked_window_picks_up_changed_settings(self):
+        self.start()
+        cloaked = self.windows[1]
+        self.focus(self.windows[0])
+        self.assertEqual(self.alpha(cloaked), 128)
+
+        self.desktop.toggle_cloak(cloaked)
+        self.assertEqual(self.backend.windows[cloaked][0], win32_backend.WINDOW_CLOAKED)
+
+        # Passes leave the cloaked window alone
+        self.transparency_dim = 100
+        self.focus(self.windows[2])
+        self.assertEqual(self.alpha(cloaked), 128)
+        self.assertEqual(self.alpha(self.windows[0]), 100)
+
+        # Uncloaking applies the current settings without waiting for a pass
+        self.desktop.toggle_cloak(cloaked)
+        self.assertTrue(self.backend.shutdown(5.0))
+        self.assertEqual(self.alpha(cloaked), 100)
+        self.assertEqual(self.backend.windows[cloaked], (win32_backend.WINDOW_DIMMED, 100))
+        self.assertEqual(self.callbacks, 2)
+
+    def test_uncloaked_foreground_window_is_activated(self):
+        self.start()
+        window = self.windows[1]
+        self.focus(self.windows[0])
+
+        self.desktop.toggle_cloak(window)
+        self.desktop.foreground = window
+        self.desktop.toggle_cloak(window)
+        self.assertTrue(self.backend.shutdown(5.0))
+
+        self.assertEqual(self.alpha(window), 255)
+        self.assertEqual(self.backend.windows[window][0], win32_backend.WINDOW_ACTIVE)
+
+class OwnerGroupTest(BackendTestCase):
+    """
+    Tests for windows that share the dim state of their root owner.
+    """
+
+    def test_focus_within_the_active_group_does_not_start_a_pass(self):
+        self.start()
+        owner = self.windows[0]
+        self.focus(owner)
+        self.assertEqual(self.callbacks, 1)
+
+        # Moving to an owned dialog and back changes nothing
+        dialog = self.desktop.create_window("#32770", owner=owner)
+        self.focus(dialog)
+        self.focus(owner)
+        self.assertEqual(self.callbacks, 1)
+
+        # Moving to another group starts a pass
+        self.focus(self.windows[1])
+        self.assertEqual(self.callbacks, 2)
+
+    def test_dimmed_group_member_is_restored_when_its_group_becomes_active(self):
+        self.start()
+        owner = self.windows[1]
+        dialog = self.desktop.create_window("#32770", owner=owner)
+
+        self.focus(self.windows[0])
+        self.assertEqual(self.alpha(owner), 128)
+        self.assertEqual(self.alpha(dialog), 128)
+
+        self.focus(owner)
+        self.assertEqual(self.alpha(owner), 255)
+        self.assertEqual(self.alpha(dialog), 255)
+        self.assertEqual(self.backend.windows[dialog], (win32_backend.WINDOW_ACTIVE, 255))
+        self.assertEqual(self.alpha(self.windows[0]), 128)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+"""
+Tests for the winapi bindings, run against a stub library built from real ctypes function pointers.
+
+Run `python -m unittest test_winapi` or `python -m pytest`.
+"""
+import ctypes
+import ctypes.wintypes
+import unittest
+
+import winapi
+
+class StubLibrary:
+    """
+    A stub for user32.dll and dwmapi.dll that records every call.
+    """
+
+    def __init__(self):
+        """
+        Initialize the StubLibrary.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.calls = []
+        self.ex_style = 0
+        self.class_name = ""
+        self.class_name_length = 0
+        self.windows = []
+        self.enum_procs = []
+        self.cloaked = 0
+
+        # Keep the exported function pointers alive for as long as the stub exists
+        self.exports = {}
+
+        self.export("GetWindowLongPtrW", winapi.LONG_PTR, [ctypes.wintypes.HWND, ctypes.c_int], self.GetWindowLongPtrW)
+        self.export("SetWindowLongPtrW", winapi.LONG_PTR, [ctypes.wintypes.HWND, ctypes.c_int, winapi.LONG_PTR], self.SetWindowLongPtrW)
+        self.export("SetLayeredWindowAttributes", ctypes.wintypes.BOOL,
+                    [ctypes.wintypes.HWND, ctypes.wintypes.DWORD, ctypes.c_ubyte, ctypes.wintypes.DWORD], self.SetLayeredWindowAttributes)
+        self.export("GetClassNameW", ctypes.c_int, [ctypes.wintypes.HWND, ctypes.c_void_p, ctypes.c_int], self.GetClassNameW)
+
+        # Take the callback as an address so that the same function pointer can be recognized on every call
+        self.export("EnumWindows", ctypes.wintypes.BOOL, [ctypes.c_void_p, ctypes.wintypes.LPARAM], self.EnumWindows)
+        self.export("DwmGetWindowAttribute", ctypes.c_long,
+                    [ctypes.wintypes.HWND, ctypes.wintypes.DWORD, ctypes.c_void_p, ctypes.wintypes.DWORD], self.DwmGetWindowAttribute)
+
+        # Functions the tests do not call only need to exist
+        for name in ("GetForegroundWindow", "IsWindowVisible", "IsIconic", "GetAncestor", "IsHungAppWindow",
+                     "SendMessageTimeoutW", "RedrawWindow", "SetWinEventHook"):
+            self.export(name, ctypes.c_int, [], lambda: 0)
+
+    def export(self, name, restype, argtypes, function):
+        """
+        Expose a Python function as a ctypes function pointer attribute, the way ctypes.WinDLL exposes exports.
+
+        Args:
+            name (str): The export name.
+            restype (type): The ctypes return type.
+            argtypes (list): The ctypes argument types.
+            function (callable): The implementation.
+
+        Returns:
+            None
+        """
+        pointer = winapi.FUNCTYPE(restype, *argtypes)(function)
+        self.exports[name] = pointer
+        setattr(self, name, pointer)
+
+    def count(self, name):
+        """
+        Count the recorded calls to an export.
+
+        Args:
+            name (str): The export name.
+
+        Returns:
+            int: The number of calls.
+        """
+        return sum(1 for call in self.calls if call[0] == name)
+
+    def GetWindowLongPtrW(self, hwnd, index):
+        self.calls.append(("GetWindowLongPtrW", hwnd, index))
+        return self.ex_style
+
+    def SetWindowLongPtrW(self, hwnd, index, value):
+        self.calls.append(("SetWindowLongPtrW", hwnd, index, value))
+        previous = self.ex_style
+        self.ex_style = value
+        return previous
+
+    def SetLayeredWindowAttributes(self, hwnd, color_key, alpha, flags):
+        self.calls.append(("SetLayeredWindowAttributes", hwnd, color_key, alpha, flags))
+        return 1 if self.ex_style & winapi.WS_EX_LAYERED else 0
+
+    def GetClassNameW(self, hwnd, buffer, length):
+        self.calls.append(("GetClassNameW", hwnd, length))
+        class_name = self.class_name[:length - 1]
+        ctypes.memmove(buffer, ctypes.create_unicode_buffer(class_name), (len(class_name) + 1) * ctypes.sizeof(ctypes.c_wchar))
+        return self.class_name_length
+
+    def EnumWindows(self, proc, lparam):
+        self.enum_procs.append(proc)
+        callback = winapi.WndEnumProcType(proc)
+        for hwnd in self.windows:
+            if not callback(hwnd, lparam):
+                break
+        return 1
+
+    def DwmGetWindowAttribute(self, hwnd, attribute, value, size):
+        self.calls.append(("DwmGetWindowAttribute", hwnd, attribute, size))
+        ctypes.wintypes.DWORD.from_address(value).value = self.cloaked
+        return 0
+
+class User32Test(unittest.TestCase):
+    """
+    Tests for the User32 bindings.
+    """
+
+    def setUp(self):
+        self.lib = StubLibrary()
+        self.user32 = winapi.User32(self.lib)
+
+    def test_ensure_layered_alpha_skips_the_style_write_when_layered(self):
+        self.lib.ex_style = winapi.WS_EX_LAYERED | 0x100
+
+        self.assertTrue(self.user32.ensure_layered_alpha(0x1234, 0, 128, winapi.LWA_ALPHA))
+
+        self.assertEqual(self.lib.count("GetWindowLongPtrW"), 1)
+        self.assertEqual(self.lib.count("SetWindowLongPtrW"), 0)
+        self.assertIn(("SetLayeredWindowAttributes", 0x1234, 0, 128, winapi.LWA_ALPHA), self.lib.calls)
+
+    def test_ensure_layered_alpha_sets_the_style_once(self):
+        self.lib.ex_style = 0x100
+
+        self.assertTrue(self.user32.ensure_layered_alpha(0x1234, 0, 200, winapi.LWA_ALPHA))
+
+        self.assertEqual(self.lib.count("GetWindowLongPtrW"), 1)
+        self.assertEqual(self.lib.calls[1], ("SetWindowLongPtrW", 0x1234, winapi.GWL_EXSTYLE, 0x100 | winapi.WS_EX_LAYERED))
+        self.assertEqual(self.lib.count("SetLayeredWindowAttributes"), 1)
+
+    def test_ensure_layered_alpha_uses_the_style_passed_in(self):
+        self.lib.ex_style = winapi.WS_EX_LAYERED
+
+        self.user32.ensure_layered_alpha(0x1234, 0, 128, winapi.LWA_ALPHA, winapi.WS_EX_LAYERED)
+
+        self.assertEqual(self.lib.count("GetWindowLongPtrW"), 0)
+        self.assertEqual(self.lib.count("SetWindowLongPtrW"), 0)
+
+    def test_ensure_layered_alpha_marshals_the_alpha_unsigned(self):
+        self.lib.ex_style = winapi.WS_EX_LAYERED
+
+        self.user32.ensure_layered_alpha(0x1234, 0xFFFFFF, 255, winapi.LWA_ALPHA | winapi.LWA_COLORKEY)
+
+        self.assertEqual(self.lib.calls[-1], ("SetLayeredWindowAttributes", 0x1234, 0xFFFFFF, 255, winapi.LWA_ALPHA | winapi.LWA_COLORKEY))
+
+    def test_get_class_name_truncates_to_the_returned_length(self):
+        # Fill the shared buffer with a longer name first, then return a shorter length than was written
+        self.lib.class_name = "Windows.UI.Core.CoreWindow"
+        self.lib.class_name_length = len(self.lib.class_name)
+        self.assertEqual(self.user32.get_class_name(0x1234), "Windows.UI.Core.CoreWindow")
+
+        self.lib.class_name = "ButtonXYZ"
+        self.lib.class_name_length = 6
+        self.assertEqual(self.user32.get_class_name(0x1234), "Button")
+
+        self.lib.class_name_length = 0
+        self.assertEqual(self.user32.get_class_name(0x1234), "")
+
+        self.assertEqual(self.lib.calls[-1], ("GetClassNameW", 0x1234, winapi.MAX_CLASS_NAME))
+
+    def test_enum_windows_reuses_one_callback(self):
+        self.lib.windows = [0x10, 0x20, 0x30]
+        first = self.user32.enum_windows()
+
+        self.lib.windows = [0x40]
+        second = self.user32.enum_windows()
+
+        self.assertEqual(first, [0x10, 0x20, 0x30])
+        self.assertEqual(second, [0x40])
+        self.assertEqual(len(self.lib.enum_procs), 2)
+        self.assertEqual(self.lib.enum_procs[0], self.lib.enum_procs[1])
+
+class DwmapiTest(unittest.TestCase):
+    """
+    Tests for the Dwmapi bindings.
+    """
+
+    def test_is_cloaked(self):
+        lib = StubLibrary()
+        dwmapi = winapi.Dwmapi(lib)
+
+        self.assertFalse(dwmapi.is_cloaked(0x1234))
+
+        lib.cloaked = 2
+        self.assertTrue(dwmapi.is_cloaked(0x1234))
+        self.assertEqual(lib.calls[-1], ("DwmGetWindowAttribute", 0x1234, winapi.DWMWA_CLOAKED, ctypes.sizeof(ctypes.wintypes.DWORD)))
+
+if __name__ == "__main__":
+    unittest.main()
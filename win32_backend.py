@@ -0,0 +1,713 @@
+"""
+Windows backend for Focus.
+
+Dims windows by making them layered and lowering their alpha with SetLayeredWindowAttributes, and tracks the
+active window through an out-of-context EVENT_OBJECT_FOCUS WinEvent hook.
+
+Windows cloaked by DWM, such as suspended UWP frames and windows on other virtual desktops, are left out of dim
+passes. Their dim state is applied when DWM uncloaks them, which is reported through EVENT_OBJECT_UNCLOAKED.
+
+Windows are grouped by their root owner, so dialogs, menus and tooltips share the dim state of the window that owns
+them. Every window in the foreground window's owner group is treated as active, and focus moves within that group
+do not start a new pass.
+
+Setting WS_EX_LAYERED sends WM_STYLECHANGING and WM_STYLECHANGED to the window's thread, so it blocks while that
+thread is hung. The Qt thread never does this: it only changes the transparency of windows that are already layered,
+which does not wait on the window's thread. Windows that still need the style, are hung, or were slow are handed to
+a small pool of worker threads. A worker pings the window with a timeout before changing it. Windows that do not
+answer are quarantined and retried by later passes with an increasing backoff. A change that a worker has not
+finished by a deadline is abandoned, the window is quarantined and the stuck worker is replaced, up to a limit.
+Undimming does not wait for quarantined windows to be due, since no later pass would retry them, and shutdown
+waits for the workers to finish the undims before Focus exits.
+"""
+import queue
+import threading
+import time
+import winapi
+
+# Window states kept in the window index
+WINDOW_ACTIVE = "active"
+WINDOW_DIMMED = "dimmed"
+WINDOW_CLOAKED = "cloaked"
+
+# Results of apply_window
+APPLY_DONE = "done"
+APPLY_FAILED = "failed"
+APPLY_QUEUED = "queued"
+APPLY_SKIPPED = "skipped"
+
+# How long a worker waits for a window to answer WM_NULL before quarantining it
+PING_TIMEOUT_MS = 200
+
+# An apply slower than this keeps the window on the worker threads until a worker applies it faster
+SLOW_APPLY_SECONDS = 0.05
+
+# A deferred change not applied within this long is abandoned and its window quarantined
+APPLY_DEADLINE_SECONDS = 1.0
+
+# The first and longest wait before a quarantined window is retried
+QUARANTINE_BACKOFF_INITIAL = 1.0
+QUARANTINE_BACKOFF_MAX = 60.0
+
+# The number of worker threads used for hung and slow windows
+WORKER_COUNT = 2
+
+# The most abandoned workers that may still be stuck before no more replacements are started
+MAX_STUCK_WORKERS = 8
+
+# Window classes that are never dimmed: the taskbar, the start button and UWP core windows
+SKIPPED_CLASS_NAMES = ("Shell_TrayWnd", "Button", "Windows.UI.Core.CoreWindow")
+
+class Win32Backend:
+    """
+    Dims and undims top-level windows on Windows.
+    """
+
+    def __init__(self, user32=None, dwmapi=None):
+        """
+        Initialize the Win32Backend.
+
+        Args:
+            user32 (winapi.User32): The user32 bindings to use. Defaults to bindings against user32.dll.
+            dwmapi (winapi.Dwmapi): The dwmapi bindings to use. Defaults to bindings against dwmapi.dll.
+
+        Returns:
+            None
+        """
+        # Bind the user32 and dwmapi functions used to dim and undim windows
+        self.user32 = user32 if user32 is not None else winapi.User32()
+        self.dwmapi = dwmapi if dwmapi is not None else winapi.Dwmapi()
+
+        # Flags used to repaint a window after its transparency changes
+        self.redraw_flags = winapi.RDW_ERASE | winapi.RDW_INVALIDATE | winapi.RDW_FRAME | winapi.RDW_ALLCHILDREN
+
+        # The window index maps each top-level window handle to its state and the last alpha Focus applied to it.
+        # Entries for windows that no longer exist are dropped at the end of every pass.
+        self.windows = {}
+
+        # Cached root owner of each top-level window, pruned together with the window index
+        self.owner_groups = {}
+
+        # The settings of the last dim pass, or None while windows are undimmed
+        self.dim_settings = None
+
+        # The root owner of the foreground window during the last dim pass
+        self.active_group = None
+
+        # Quarantined windows, mapped to the time they may be retried and the backoff that led to it
+        self.quarantine = {}
+
+        # Windows handed to the worker threads, mapped to their latest change, or None once a worker has taken it,
+        # and the time the change was queued or taken
+        self.pending = {}
+
+        # Windows whose last apply was slow, kept on the worker threads until a worker applies them quickly
+        self.slow_windows = set()
+
+        # The worker threads are started the first time a window needs them. Each live worker is mapped to the
+        # window it is working on, or None while idle. Abandoned workers are only counted until their call returns.
+        self.lock = threading.Lock()
+        self.work_queue = queue.Queue()
+        self.workers = {}
+        self.stuck_workers = 0
+
+        self.callback = None
+        self.WinEventProc = None
+        self.hooks = []
+
+    def start(self, callback):
+        """
+        Start watching for active window changes and for windows being cloaked and uncloaked.
+
+        Args:
+            callback (callable): Called with no arguments whenever the active window may have changed.
+
+        Returns:
+            None
+        """
+        self.callback = callback
+
+        # Use WinEventProcType to create a callback function that receives notifications
+        self.WinEventProc = winapi.WinEventProcType(self.win_event_callback)
+
+        # Use user32.SetWinEventHook to hook to the active window change callback and the cloak events
+        flags = winapi.WINEVENT_OUTOFCONTEXT | winapi.WINEVENT_SKIPOWNPROCESS
+        self.hooks.append(self.user32.set_win_event_hook(winapi.EVENT_OBJECT_FOCUS, winapi.EVENT_OBJECT_FOCUS, self.WinEventProc, flags))
+        self.hooks.append(self.user32.set_win_event_hook(winapi.EVENT_OBJECT_CLOAKED, winapi.EVENT_OBJECT_UNCLOAKED, self.WinEventProc, flags))
+
+    def win_event_callback(self, hWinEventHook, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime):
+        """
+        WinEvent callback triggered when the focus changes or a window is cloaked or uncloaked.
+
+        Args:
+            hWinEventHook (int): The handle to the event hook.
+            event (int): The event that occurred.
+            hwnd (int): The handle to the window that triggered the event.
+            idObject (int): The identifier of the object associated with the event.
+            idChild (int): The identifier of the child object associated with the event.
+            dwEventThread (int): The identifier of the thread that triggered the event.
+            dwmsEventTime (int): The timestamp of the event.
+
+        Returns:
+            None
+        """
+        if event == winapi.EVENT_OBJECT_FOCUS:
+            #print("Active window changed (hwnd: " + str(hwnd) + ")")
+
+            # Focus moving to a dialog, menu or popup of the active window, or back again, changes nothing
+            if self.dim_settings is not None and self.active_group is not None:
+                if self.get_owner_group(self.user32.get_foreground_window()) == self.active_group:
+                    return
+
+            if self.callback is not None:
+                self.callback()
+
+        # Only cloak events for whole windows are interesting
+        elif hwnd is not None and idObject == winapi.OBJID_WINDOW and idChild == winapi.CHILDID_SELF:
+            if event == winapi.EVENT_OBJECT_CLOAKED:
+                self.window_cloaked(hwnd)
+            elif event == winapi.EVENT_OBJECT_UNCLOAKED:
+                self.window_uncloaked(hwnd)
+
+    def window_cloaked(self, hwnd):
+        """
+        Record that DWM has cloaked a window so that passes leave it alone.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        alpha = self.windows.get(hwnd, (None, None))[1]
+        self.windows[hwnd] = (WINDOW_CLOAKED, alpha)
+
+    def window_uncloaked(self, hwnd):
+        """
+        Apply the current dim state to a window that DWM has just uncloaked.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            None
+        """
+        # Top-level windows only appear in the index once a pass or a cloak event has seen them
+        if hwnd not in self.windows or self.windows[hwnd][0] != WINDOW_CLOAKED:
+            return
+
+        alpha = self.windows[hwnd][1]
+
+        # Nothing to apply while windows are undimmed, since undim_all_windows already restored cloaked windows
+        if self.dim_settings is None:
+            self.windows[hwnd] = (WINDOW_ACTIVE, alpha)
+            return
+
+        tint, transparency_dim, transparency_default = self.dim_settings
+
+        if hwnd == self.user32.get_foreground_window() or self.get_owner_group(hwnd) == self.active_group:
+            self.activate_window(hwnd, transparency_default)
+        elif self.is_dimmable(hwnd):
+            self.dim_window(hwnd, tint, transparency_dim)
+        else:
+            self.windows[hwnd] = (WINDOW_ACTIVE, alpha)
+
+    def get_owner_group(self, hwnd):
+        """
+        Get the owner group of a window, which is identified by its root owner.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            int: The root owner window handle, or None if hwnd is None.
+        """
+        if hwnd is None:
+            return None
+
+        # The owner chain of a window is fixed for its lifetime in practice, so look it up only once
+        group = self.owner_groups.get(hwnd)
+
+        if group is None:
+            group = self.user32.get_root_owner(hwnd) or hwnd
+            self.owner_groups[hwnd] = group
+
+        return group
+
+    def is_dimmable(self, hwnd):
+        """
+        Check whether a window is visible, not minimized and not one of the skipped shell windows.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            bool: True if the window can be dimmed.
+        """
+        return self.is_window_shown(hwnd) and not self.is_skipped_class(hwnd)
+
+    def is_window_shown(self, hwnd):
+        """
+        Check whether a window is visible and not minimized.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            bool: True if the window is shown.
+        """
+        return self.user32.is_window_visible(hwnd) and not self.user32.is_iconic(hwnd)
+
+    def is_skipped_class(self, hwnd):
+        """
+        Check whether a window is the taskbar, the start button or a UWP core window.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            bool: True if the window's class is never dimmed.
+        """
+        return self.user32.get_class_name(hwnd) in SKIPPED_CLASS_NAMES
+
+    def dim_window(self, hwnd, tint, transparency_dim):
+        """
+        Dim a single window and record it in the window index.
+
+        Args:
+            hwnd (int): The window handle.
+            tint (int): The tint color used as the color key. (Range: 0x000000 to 0xFFFFFF)
+            transparency_dim (int): The transparency of inactive windows. (Range: 0 to 255)
+
+        Returns:
+            None
+        """
+        #print("Dimming window (hwnd: " + str(hwnd) + ")")
+        #print("Transparency: " + str(transparency_dim) + ", Tint: " + str(hex(tint)))
+        flags = winapi.LWA_COLORKEY | winapi.LWA_ALPHA
+
+        # Make sure WS_EX_LAYERED is set and apply the dim transparency
+        result = self.apply_window(hwnd, tint, transparency_dim, flags, True)
+
+        if result == APPLY_FAILED:
+            print("Error setting layered window attributes (hwnd: " + str(hwnd) + ")")
+            print("Error: " + str(winapi.get_last_error()))
+
+        # A quarantined window keeps its last recorded state until a later pass retries it
+        if result != APPLY_SKIPPED:
+            self.windows[hwnd] = (WINDOW_DIMMED, transparency_dim)
+
+    def activate_window(self, hwnd, transparency_default):
+        """
+        Restore a window to the default transparency and record it in the window index as active.
+
+        Args:
+            hwnd (int): The window handle.
+            transparency_default (int): The default transparency. (Range: 0 to 255)
+
+        Returns:
+            None
+        """
+        # Make sure WS_EX_LAYERED is set and restore the default transparency
+        if self.apply_window(hwnd, 0, transparency_default, winapi.LWA_ALPHA, False) != APPLY_SKIPPED:
+            self.windows[hwnd] = (WINDOW_ACTIVE, transparency_default)
+
+    def apply_window(self, hwnd, color_key, alpha, flags, redraw, force=False):
+        """
+        Make sure a window is layered, set its layered attributes and optionally redraw it, without blocking on it.
+
+        Quarantined windows are skipped until their retry time, unless force is set. Windows that are quarantined,
+        hung, slow or not layered yet are handed to the worker threads. Everything else only has its transparency
+        changed right away, which does not send any messages to the window's thread.
+
+        Args:
+            hwnd (int): The window handle.
+            color_key (int): The color key as a COLORREF. (Range: 0x000000 to 0xFFFFFF)
+            alpha (int): The opacity. (Range: 0 to 255)
+            flags (int): A combination of LWA_COLORKEY and LWA_ALPHA.
+            redraw (bool): Whether to redraw the window afterwards.
+            force (bool): Whether to hand a quarantined window to the workers before its retry time.
+
+        Returns:
+            str: APPLY_DONE or APPLY_FAILED for a change made right away, APPLY_QUEUED if it was handed to the
+                worker threads, or APPLY_SKIPPED if the window is quarantined.
+        """
+        # The extended style has not been read yet, so the worker reads it
+        change = (color_key, alpha, flags, redraw, None)
+
+        with self.lock:
+            # A worker already has this window, so just give it the latest change
+            if hwnd in self.pending:
+                self.pending[hwnd] = (change, self.pending[hwnd][1])
+                return APPLY_QUEUED
+
+            retry_at = self.quarantine.get(hwnd, (None, None))[0]
+
+            # Leave quarantined windows alone until they are due for a retry
+            if retry_at is not None and retry_at > time.monotonic() and not force:
+                return APPLY_SKIPPED
+
+            deferred = retry_at is not None or hwnd in self.slow_windows
+
+        if deferred or self.user32.is_hung_app_window(hwnd):
+            self.defer_window(hwnd, change)
+            return APPLY_QUEUED
+
+        # Setting WS_EX_LAYERED waits on the window's thread, so only the workers do it, using the style read here
+        ex_style = self.user32.get_window_ex_style(hwnd)
+        if ex_style & winapi.WS_EX_LAYERED == 0:
+            self.defer_window(hwnd, (color_key, alpha, flags, redraw, ex_style))
+            return APPLY_QUEUED
+
+        start = time.perf_counter()
+        applied = self.user32.set_layered_window_attributes(hwnd, color_key, alpha, flags)
+
+        # Without RDW_UPDATENOW or RDW_ERASENOW the repaint is queued to the window's thread instead of sent
+        if redraw:
+            self.user32.redraw_window(hwnd, self.redraw_flags)
+
+        # Keep this window on the workers until one of them applies it quickly
+        if time.perf_counter() - start > SLOW_APPLY_SECONDS:
+            print("Window is slow to respond - moving it off the main thread (hwnd: " + str(hwnd) + ")")
+            with self.lock:
+                self.slow_windows.add(hwnd)
+
+        return APPLY_DONE if applied else APPLY_FAILED
+
+    def apply_window_now(self, hwnd, color_key, alpha, flags, redraw, ex_style=None):
+        """
+        Make sure a window is layered, set its layered attributes and optionally redraw it on the calling thread.
+
+        Args:
+            hwnd (int): The window handle.
+            color_key (int): The color key as a COLORREF. (Range: 0x000000 to 0xFFFFFF)
+            alpha (int): The opacity. (Range: 0 to 255)
+            flags (int): A combination of LWA_COLORKEY and LWA_ALPHA.
+            redraw (bool): Whether to redraw the window afterwards.
+            ex_style (int): The extended window style read by apply_window, or None to read it here.
+
+        Returns:
+            bool: True if the layered attributes were applied.
+        """
+        applied = self.user32.ensure_layered_alpha(hwnd, color_key, alpha, flags, ex_style)
+
+        if redraw:
+            self.user32.redraw_window(hwnd, self.redraw_flags)
+
+        return applied
+
+    def defer_window(self, hwnd, change):
+        """
+        Hand a change to the worker threads, starting them if needed.
+
+        Args:
+            hwnd (int): The window handle.
+            change (tuple): The color key, alpha, flags, redraw and ex_style arguments of apply_window_now.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            queued = hwnd in self.pending
+            self.pending[hwnd] = (change, self.pending[hwnd][1] if queued else time.monotonic())
+
+            # A worker already has this window and will pick up the latest change
+            if queued:
+                return
+
+            self.start_workers()
+
+        self.work_queue.put(hwnd)
+
+    def start_workers(self):
+        """
+        Start worker threads until there are WORKER_COUNT live workers, unless too many abandoned ones are stuck.
+
+        Must be called with the lock held.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        while len(self.workers) < WORKER_COUNT and self.stuck_workers < MAX_STUCK_WORKERS:
+            # Daemon threads so that a window that hangs forever cannot keep Focus from exiting
+            worker = threading.Thread(target=self.worker_loop, name="Focus apply worker", daemon=True)
+            self.workers[worker] = None
+            worker.start()
+
+    def quarantine_window(self, hwnd):
+        """
+        Quarantine a window, doubling its backoff since the last failed retry.
+
+        Must be called with the lock held.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            float: The number of seconds until the window is retried.
+        """
+        backoff = self.quarantine.get(hwnd, (None, 0.0))[1]
+        backoff = min(max(backoff * 2, QUARANTINE_BACKOFF_INITIAL), QUARANTINE_BACKOFF_MAX)
+        self.quarantine[hwnd] = (time.monotonic() + backoff, backoff)
+        self.pending.pop(hwnd, None)
+
+        return backoff
+
+    def reap_stuck_workers(self):
+        """
+        Abandon deferred changes that missed the deadline and replace the workers stuck on them.
+
+        A worker cannot be interrupted while a window blocks it, so it is left to finish on its own and exits
+        when its call returns. Its window is quarantined like one that did not answer the ping.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+
+        with self.lock:
+            expired = set(hwnd for hwnd, (change, changed_at) in self.pending.items() if now - changed_at > APPLY_DEADLINE_SECONDS)
+
+            if not expired:
+                return
+
+            for hwnd in expired:
+                backoff = self.quarantine_window(hwnd)
+                print("Window change timed out - retrying in " + str(backoff) + " seconds (hwnd: " + str(hwnd) + ")")
+
+            for worker in [worker for worker, hwnd in self.workers.items() if hwnd in expired]:
+                del self.workers[worker]
+                self.stuck_workers += 1
+
+            self.start_workers()
+
+    def worker_loop(self):
+        """
+        Apply deferred changes on a worker thread.
+
+        Each window is pinged first. A window that answers gets its latest pending change and leaves quarantine,
+        and leaves the slow windows if the change was applied quickly. A window that does not answer is
+        quarantined, with the backoff doubling on every failed retry. The worker exits if reap_stuck_workers has
+        abandoned it.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        worker = threading.current_thread()
+
+        while True:
+            hwnd = self.work_queue.get()
+
+            with self.lock:
+                # The change was abandoned or its window destroyed while it was queued
+                if hwnd not in self.pending:
+                    continue
+
+                self.workers[worker] = hwnd
+                self.pending[hwnd] = (self.pending[hwnd][0], time.monotonic())
+
+            while True:
+                # Bounded by the ping timeout
+                responsive = self.user32.ping_window(hwnd, PING_TIMEOUT_MS)
+
+                with self.lock:
+                    if worker not in self.workers:
+                        self.stuck_workers -= 1
+                        return
+
+                    if not responsive:
+                        backoff = self.quarantine_window(hwnd)
+                        print("Window is not responding - retrying in " + str(backoff) + " seconds (hwnd: " + str(hwnd) + ")")
+                        break
+
+                    change = self.pending.get(hwnd, (None, None))[0]
+
+                    # Done once no newer change arrived while the last one was being applied
+                    if change is None:
+                        self.pending.pop(hwnd, None)
+                        self.quarantine.pop(hwnd, None)
+                        break
+
+                    self.pending[hwnd] = (None, time.monotonic())
+
+                # Bounded by reap_stuck_workers, which abandons this worker if the window blocks it
+                start = time.perf_counter()
+                self.apply_window_now(hwnd, *change)
+                slow = time.perf_counter() - start > SLOW_APPLY_SECONDS
+
+                with self.lock:
+                    if worker not in self.workers:
+                        self.stuck_workers -= 1
+                        return
+
+                    if slow:
+                        self.slow_windows.add(hwnd)
+                    else:
+                        self.slow_windows.discard(hwnd)
+
+            with self.lock:
+                if worker not in self.workers:
+                    self.stuck_workers -= 1
+                    return
+
+                self.workers[worker] = None
+
+    def dim_inactive_windows(self, tint, transparency_dim, transparency_default):
+        """
+        Dim every visible top-level window except the windows in the active window's owner group.
+
+        The taskbar, start menu and UWP core windows are skipped. Cloaked windows are recorded in the window index
+        and dimmed when they are uncloaked.
+
+        Args:
+            tint (int): The tint color used as the color key. (Range: 0x000000 to 0xFFFFFF)
+            transparency_dim (int): The transparency of inactive windows. (Range: 0 to 255)
+            transparency_default (int): The transparency of the active window. (Range: 0 to 255)
+
+        Returns:
+            None
+        """
+        self.dim_settings = (tint, transparency_dim, transparency_default)
+        self.reap_stuck_workers()
+
+        # Get the handle of the active window and its owner group
+        active_window = self.user32.get_foreground_window()
+        self.active_group = self.get_owner_group(active_window)
+
+        if active_window is not None:
+            self.activate_window(active_window, transparency_default)
+
+        # Enumerate all top-level windows
+        windows = self.user32.enum_windows()
+
+        for hwnd in windows:
+            # Skip the active window and null handles
+            if hwnd == active_window or hwnd is None:
+                continue
+
+            # The checks of is_dimmable, split up so the cheaper cloak and owner group checks run before the class
+            # name lookup
+            if not self.is_window_shown(hwnd):
+                continue
+
+            # Leave cloaked windows until they are uncloaked
+            if self.dwmapi.is_cloaked(hwnd):
+                self.window_cloaked(hwnd)
+                continue
+
+            # Treat the rest of the active window's owner group as active, restoring any that were dimmed before
+            if self.active_group is not None and self.get_owner_group(hwnd) == self.active_group:
+                if self.windows.get(hwnd, (None, None))[0] == WINDOW_DIMMED:
+                    self.activate_window(hwnd, transparency_default)
+                continue
+
+            # Make sure the window is not the taskbar or the start menu
+            if not self.is_skipped_class(hwnd):
+                self.dim_window(hwnd, tint, transparency_dim)
+
+        self.prune_windows(windows)
+
+    def undim_all_windows(self, tint, transparency_default):
+        """
+        Restore every visible top-level window to the default transparency.
+
+        Cloaked windows are only touched if Focus dimmed them, since this also runs on exit and there may be no
+        later chance to undo the dim.
+
+        Args:
+            tint (int): The tint color used as the color key. (Range: 0x000000 to 0xFFFFFF)
+            transparency_default (int): The default transparency. (Range: 0 to 255)
+
+        Returns:
+            None
+        """
+        self.dim_settings = None
+        self.active_group = None
+        self.reap_stuck_workers()
+
+        # Enumerate all top-level windows
+        windows = self.user32.enum_windows()
+
+        for hwnd in windows:
+            # Make sure hwnd is not null and the window is visible
+            if hwnd is None or not self.is_window_shown(hwnd):
+                continue
+
+            cloaked = self.dwmapi.is_cloaked(hwnd)
+            state, alpha = self.windows.get(hwnd, (None, None))
+
+            if cloaked and (alpha is None or alpha == transparency_default):
+                self.windows[hwnd] = (WINDOW_CLOAKED, alpha)
+                continue
+
+            #print("Undimming window (hwnd: " + str(hwnd) + ")")
+
+            # Make sure WS_EX_LAYERED is set and restore the default transparency. Quarantined windows are handed to
+            # the workers right away, since no later pass will retry them.
+            if self.apply_window(hwnd, tint, transparency_default, winapi.LWA_ALPHA | winapi.LWA_COLORKEY, True, True) != APPLY_SKIPPED:
+                self.windows[hwnd] = (WINDOW_CLOAKED if cloaked else WINDOW_ACTIVE, transparency_default)
+
+        self.prune_windows(windows)
+
+    def shutdown(self, timeout):
+        """
+        Wait for the worker threads to finish every deferred change, such as the undims made before exiting.
+
+        Each window is still bounded by the ping timeout and APPLY_DEADLINE_SECONDS, so a hung window cannot hold
+        up the exit for longer than that.
+
+        Args:
+            timeout (float): The longest time to wait, in seconds.
+
+        Returns:
+            bool: True if every deferred change was applied or abandoned in time.
+        """
+        deadline = time.monotonic() + timeout
+
+        while True:
+            # Abandon changes that missed the deadline so that they do not hold up the exit
+            self.reap_stuck_workers()
+
+            with self.lock:
+                remaining = len(self.pending)
+
+            if remaining == 0:
+                return True
+
+            if time.monotonic() >= deadline:
+                print("Timed out waiting for " + str(remaining) + " windows to be restored")
+                return False
+
+            time.sleep(0.01)
+
+    def prune_windows(self, windows):
+        """
+        Drop window index, owner group, quarantine, pending and slow window entries for windows that no longer exist.
+
+        Args:
+            windows (list): Every top-level window handle from the latest enumeration.
+
+        Returns:
+            None
+        """
+        current = set(windows)
+        for hwnd in [hwnd for hwnd in self.windows if hwnd not in current]:
+            del self.windows[hwnd]
+        for hwnd in [hwnd for hwnd in self.owner_groups if hwnd not in current]:
+            del self.owner_groups[hwnd]
+
+        with self.lock:
+            for hwnd in [hwnd for hwnd in self.quarantine if hwnd not in current]:
+                del self.quarantine[hwnd]
+            for hwnd in [hwnd for hwnd in self.pending if hwnd not in current]:
+                del self.pending[hwnd]
+            self.slow_windows &= current
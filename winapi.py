@@ -0,0 +1,411 @@
+"""
+Typed ctypes bindings for the user32 and dwmapi functions used by Focus.
+
+Every function pointer is resolved once when User32 or Dwmapi is created and carries a full argtypes/restype signature,
+so calls on the dimming hot path skip the windll attribute lookup and the pywin32 wrappers entirely.
+
+The library object is injectable. On Windows it defaults to user32.dll, but any object whose attributes accept
+argtypes/restype and can be called (for example a stub library) can be used instead, which keeps this module
+importable and testable on Linux.
+"""
+import ctypes
+import ctypes.wintypes
+
+# Window styles and attributes (WinUser.h)
+GWL_EXSTYLE = -20
+WS_EX_LAYERED = 0x00080000
+LWA_COLORKEY = 0x00000001
+LWA_ALPHA = 0x00000002
+
+# GetAncestor flags (WinUser.h)
+GA_ROOTOWNER = 3
+
+# RedrawWindow flags (WinUser.h)
+RDW_INVALIDATE = 0x0001
+RDW_ERASE = 0x0004
+RDW_ALLCHILDREN = 0x0080
+RDW_FRAME = 0x0400
+
+# SendMessageTimeout constants (WinUser.h)
+WM_NULL = 0x0000
+SMTO_ABORTIFHUNG = 0x0002
+
+# WinEvent constants (WinUser.h)
+EVENT_OBJECT_FOCUS = 0x8005
+EVENT_OBJECT_CLOAKED = 0x8017
+EVENT_OBJECT_UNCLOAKED = 0x8018
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+
+# DWM window attributes (dwmapi.h)
+DWMWA_CLOAKED = 14
+
+# The maximum class name length allowed by RegisterClass
+MAX_CLASS_NAME = 256
+
+# Windows callbacks use stdcall; fall back to cdecl so the module still loads on other platforms
+FUNCTYPE = getattr(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE)
+
+# ctypes.get_last_error only exists on Windows
+get_last_error = getattr(ctypes, "get_last_error", lambda: 0)
+
+LONG_PTR = ctypes.c_ssize_t
+
+WinEventProcType = FUNCTYPE(
+    None,
+    ctypes.wintypes.HANDLE,
+    ctypes.wintypes.DWORD,
+    ctypes.wintypes.HWND,
+    ctypes.wintypes.LONG,
+    ctypes.wintypes.LONG,
+    ctypes.wintypes.DWORD,
+    ctypes.wintypes.DWORD
+)
+
+WndEnumProcType = FUNCTYPE(
+    ctypes.wintypes.BOOL,
+    ctypes.wintypes.HWND,
+    ctypes.wintypes.LPARAM
+)
+
+def _bind(lib, name, restype, argtypes, fallback=None):
+    """
+    Resolve a function pointer from a library and set its signature.
+
+    Args:
+        lib (object): The library to resolve the function from.
+        name (str): The exported function name.
+        restype (type): The ctypes return type.
+        argtypes (list): The ctypes argument types.
+        fallback (str): An export to use instead if name does not exist.
+
+    Returns:
+        object: The bound function pointer.
+    """
+    try:
+        function = getattr(lib, name)
+    except AttributeError:
+        if fallback is None:
+            raise
+        function = getattr(lib, fallback)
+
+    function.argtypes = argtypes
+    function.restype = restype
+    return function
+
+class User32:
+    """
+    Prebound, typed access to the user32 functions used by Focus.
+    """
+
+    def __init__(self, lib=None):
+        """
+        Initialize the User32 bindings.
+
+        Args:
+            lib (object): The library to bind against. Defaults to user32.dll loaded with use_last_error enabled.
+
+        Returns:
+            None
+        """
+        if lib is None:
+            lib = ctypes.WinDLL("user32", use_last_error=True)
+
+        self.lib = lib
+
+        # Resolve every function pointer once and give it a full signature
+        self._GetForegroundWindow = _bind(lib, "GetForegroundWindow", ctypes.wintypes.HWND, [])
+        self._IsWindowVisible = _bind(lib, "IsWindowVisible", ctypes.wintypes.BOOL, [ctypes.wintypes.HWND])
+        self._IsIconic = _bind(lib, "IsIconic", ctypes.wintypes.BOOL, [ctypes.wintypes.HWND])
+        self._GetAncestor = _bind(lib, "GetAncestor", ctypes.wintypes.HWND, [ctypes.wintypes.HWND, ctypes.wintypes.UINT])
+        self._GetClassNameW = _bind(lib, "GetClassNameW", ctypes.c_int,
+                                         [ctypes.wintypes.HWND, ctypes.wintypes.LPWSTR, ctypes.c_int])
+
+        # GetWindowLongPtrW and SetWindowLongPtrW are macros for the non-Ptr variants on 32-bit Windows
+        self._GetWindowLongPtrW = _bind(lib, "GetWindowLongPtrW", LONG_PTR,
+                                             [ctypes.wintypes.HWND, ctypes.c_int], fallback="GetWindowLongW")
+        self._SetWindowLongPtrW = _bind(lib, "SetWindowLongPtrW", LONG_PTR,
+                                             [ctypes.wintypes.HWND, ctypes.c_int, LONG_PTR], fallback="SetWindowLongW")
+
+        self._IsHungAppWindow = _bind(lib, "IsHungAppWindow", ctypes.wintypes.BOOL, [ctypes.wintypes.HWND])
+        self._SendMessageTimeoutW = _bind(lib, "SendMessageTimeoutW", LONG_PTR,
+                                               [ctypes.wintypes.HWND, ctypes.wintypes.UINT, ctypes.wintypes.WPARAM,
+                                                ctypes.wintypes.LPARAM, ctypes.wintypes.UINT, ctypes.wintypes.UINT,
+                                                ctypes.POINTER(ctypes.c_size_t)])
+        self._SetLayeredWindowAttributes = _bind(lib, "SetLayeredWindowAttributes", ctypes.wintypes.BOOL,
+                                                      [ctypes.wintypes.HWND, ctypes.wintypes.DWORD,
+                                                       ctypes.c_ubyte, ctypes.wintypes.DWORD])
+        self._RedrawWindow = _bind(lib, "RedrawWindow", ctypes.wintypes.BOOL,
+                                        [ctypes.wintypes.HWND, ctypes.POINTER(ctypes.wintypes.RECT),
+                                         ctypes.wintypes.HRGN, ctypes.wintypes.UINT])
+        self._EnumWindows = _bind(lib, "EnumWindows", ctypes.wintypes.BOOL,
+                                       [WndEnumProcType, ctypes.wintypes.LPARAM])
+        self._SetWinEventHook = _bind(lib, "SetWinEventHook", ctypes.wintypes.HANDLE,
+                                           [ctypes.wintypes.DWORD, ctypes.wintypes.DWORD, ctypes.wintypes.HMODULE,
+                                            WinEventProcType, ctypes.wintypes.DWORD, ctypes.wintypes.DWORD,
+                                            ctypes.wintypes.DWORD])
+
+        # Reuse one class name buffer instead of allocating a new one for every window
+        self._class_name_buffer = ctypes.create_unicode_buffer(MAX_CLASS_NAME)
+
+        # Create the EnumWindows callback once so that enumerating does not build a new closure every pass
+        self._enum_results = []
+        self._enum_proc = WndEnumProcType(self._enum_windows_callback)
+
+    def _enum_windows_callback(self, hwnd, lparam):
+        """
+        Collect each window handle passed in by EnumWindows.
+
+        Args:
+            hwnd (int): The window handle.
+            lparam (int): Unused.
+
+        Returns:
+            bool: True to continue enumerating.
+        """
+        self._enum_results.append(hwnd)
+        return True
+
+    def enum_windows(self):
+        """
+        Enumerate all top-level windows.
+
+        Args:
+            None
+
+        Returns:
+            list: The window handles in Z order.
+        """
+        self._enum_results = []
+        self._EnumWindows(self._enum_proc, 0)
+        windows = self._enum_results
+        self._enum_results = []
+        return windows
+
+    def get_foreground_window(self):
+        """
+        Get the handle of the foreground window.
+
+        Args:
+            None
+
+        Returns:
+            int: The window handle, or None if there is no foreground window.
+        """
+        return self._GetForegroundWindow()
+
+    def is_window_visible(self, hwnd):
+        """
+        Check whether a window has the WS_VISIBLE style.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            bool: True if the window is visible.
+        """
+        return self._IsWindowVisible(hwnd) != 0
+
+    def is_iconic(self, hwnd):
+        """
+        Check whether a window is minimized.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            bool: True if the window is minimized.
+        """
+        return self._IsIconic(hwnd) != 0
+
+    def is_hung_app_window(self, hwnd):
+        """
+        Check whether Windows considers the thread that owns a window to be hung.
+
+        This does not send the window any messages, so it never blocks.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            bool: True if the window is not responding.
+        """
+        return self._IsHungAppWindow(hwnd) != 0
+
+    def ping_window(self, hwnd, timeout_ms):
+        """
+        Send WM_NULL to a window and wait at most timeout_ms for its thread to process it.
+
+        This is safe to call from any thread. It returns immediately if the window is already known to be hung.
+
+        Args:
+            hwnd (int): The window handle.
+            timeout_ms (int): The longest time to wait, in milliseconds.
+
+        Returns:
+            bool: True if the window responded in time.
+        """
+        result = ctypes.c_size_t()
+        return self._SendMessageTimeoutW(hwnd, WM_NULL, 0, 0, SMTO_ABORTIFHUNG, timeout_ms, ctypes.byref(result)) != 0
+
+    def get_root_owner(self, hwnd):
+        """
+        Get the root owner of a window by walking its parent and owner chain.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            int: The root owner window handle, which is hwnd itself for an unowned top-level window, or None on failure.
+        """
+        return self._GetAncestor(hwnd, GA_ROOTOWNER)
+
+    def get_class_name(self, hwnd):
+        """
+        Get the class name of a window.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            str: The class name, or an empty string on failure.
+        """
+        length = self._GetClassNameW(hwnd, self._class_name_buffer, MAX_CLASS_NAME)
+        return self._class_name_buffer.value[:length]
+
+    def get_window_ex_style(self, hwnd):
+        """
+        Get the extended window style.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            int: The extended window style.
+        """
+        return self._GetWindowLongPtrW(hwnd, GWL_EXSTYLE)
+
+    def set_window_ex_style(self, hwnd, ex_style):
+        """
+        Set the extended window style.
+
+        Args:
+            hwnd (int): The window handle.
+            ex_style (int): The new extended window style.
+
+        Returns:
+            int: The previous extended window style, or 0 on failure.
+        """
+        return self._SetWindowLongPtrW(hwnd, GWL_EXSTYLE, ex_style)
+
+    def set_layered_window_attributes(self, hwnd, color_key, alpha, flags):
+        """
+        Set the color key and opacity of a layered window.
+
+        Args:
+            hwnd (int): The window handle.
+            color_key (int): The color key as a COLORREF. (Range: 0x000000 to 0xFFFFFF)
+            alpha (int): The opacity. (Range: 0 to 255)
+            flags (int): A combination of LWA_COLORKEY and LWA_ALPHA.
+
+        Returns:
+            bool: True on success.
+        """
+        return self._SetLayeredWindowAttributes(hwnd, color_key, alpha, flags) != 0
+
+    def redraw_window(self, hwnd, flags):
+        """
+        Redraw the whole of a window.
+
+        Args:
+            hwnd (int): The window handle.
+            flags (int): A combination of RDW_* flags.
+
+        Returns:
+            bool: True on success.
+        """
+        return self._RedrawWindow(hwnd, None, None, flags) != 0
+
+    def set_win_event_hook(self, event_min, event_max, proc, flags):
+        """
+        Install an out-of-context WinEvent hook for all processes and threads.
+
+        Args:
+            event_min (int): The lowest event to hook.
+            event_max (int): The highest event to hook.
+            proc (WinEventProcType): The callback. The caller must keep a reference to it.
+            flags (int): A combination of WINEVENT_* flags.
+
+        Returns:
+            int: The hook handle, or None on failure.
+        """
+        return self._SetWinEventHook(event_min, event_max, None, proc, 0, 0, flags)
+
+    def ensure_layered_alpha(self, hwnd, color_key, alpha, flags, ex_style=None):
+        """
+        Make sure a window has WS_EX_LAYERED set and apply its layered attributes.
+
+        The extended style is read at most once and only written if WS_EX_LAYERED is missing.
+
+        Args:
+            hwnd (int): The window handle.
+            color_key (int): The color key as a COLORREF. (Range: 0x000000 to 0xFFFFFF)
+            alpha (int): The opacity. (Range: 0 to 255)
+            flags (int): A combination of LWA_COLORKEY and LWA_ALPHA.
+            ex_style (int): The extended window style if the caller has just read it, otherwise None to read it.
+
+        Returns:
+            bool: True if the layered attributes were applied.
+        """
+        if ex_style is None:
+            ex_style = self.get_window_ex_style(hwnd)
+
+        if ex_style & WS_EX_LAYERED == 0:
+            self.set_window_ex_style(hwnd, ex_style | WS_EX_LAYERED)
+
+        # SetLayeredWindowAttributes fails if the style change did not stick, so there is no need to read it back
+        return self.set_layered_window_attributes(hwnd, color_key, alpha, flags)
+
+class Dwmapi:
+    """
+    Prebound, typed access to the dwmapi functions used by Focus.
+    """
+
+    def __init__(self, lib=None):
+        """
+        Initialize the Dwmapi bindings.
+
+        Args:
+            lib (object): The library to bind against. Defaults to dwmapi.dll.
+
+        Returns:
+            None
+        """
+        if lib is None:
+            lib = ctypes.WinDLL("dwmapi")
+
+        self.lib = lib
+
+        # Resolve the function pointer once and give it a full signature
+        self._DwmGetWindowAttribute = _bind(lib, "DwmGetWindowAttribute", ctypes.c_long,
+                                            [ctypes.wintypes.HWND, ctypes.wintypes.DWORD,
+                                             ctypes.c_void_p, ctypes.wintypes.DWORD])
+
+        # Reuse one output buffer instead of allocating a new one for every window
+        self._cloaked = ctypes.wintypes.DWORD()
+
+    def is_cloaked(self, hwnd):
+        """
+        Check whether DWM has cloaked a window, for example a suspended UWP frame or a window on another virtual desktop.
+
+        Args:
+            hwnd (int): The window handle.
+
+        Returns:
+            bool: True if the window is cloaked. False if it is not, or if the attribute cannot be read.
+        """
+        self._cloaked.value = 0
+        result = self._DwmGetWindowAttribute(hwnd, DWMWA_CLOAKED, ctypes.byref(self._cloaked), ctypes.sizeof(self._cloaked))
+        return result == 0 and self._cloaked.value != 0
@@ -0,0 +1,321 @@
+"""
+X11 backend for Focus.
+
+Dims client windows by setting _NET_WM_WINDOW_OPACITY, which compositing managers use as the window opacity.
+The active window and the client list are tracked through PropertyNotify events on the root window instead of
+polling, so a dim pass needs no queries: every opacity change of the pass is queued and sent in one batch with a
+single flush and round trip.
+
+Any X server works, including Xvfb, by passing its display name to X11Backend.
+"""
+import os
+import sys
+
+from PyQt6.QtCore import QSocketNotifier, QTimer
+from Xlib import X, Xatom, display, error
+
+# _NET_WM_WINDOW_OPACITY is a CARDINAL where 0xFFFFFFFF is fully opaque
+OPACITY_MAX = 0xFFFFFFFF
+
+# Raised by Display when there is no X server to connect to, for example on Wayland without XWayland, and by any
+# request once the X server has closed the connection
+CONNECTION_ERRORS = (error.DisplayError, error.ConnectionClosedError)
+
+def exit_on_connection_error(display_name, e):
+    """
+    Print a readable error for an X server connection that failed or was lost, and exit.
+
+    Args:
+        display_name (str): The X display, or None for the DISPLAY environment variable.
+        e (Exception): The connection error.
+
+    Returns:
+        None
+    """
+    if display_name is None:
+        display_name = os.environ.get("DISPLAY", "(DISPLAY is not set)")
+
+    print("====================================")
+    print("Error with the connection to the X server at display: " + display_name)
+    print("Error: " + str(e))
+    print("Focus needs an X11 session, or XWayland on Wayland, to run on Linux.")
+    print("====================================")
+    sys.exit(1)
+
+# Window types that should never be dimmed, like the taskbar on Windows
+SKIPPED_WINDOW_TYPES = ("_NET_WM_WINDOW_TYPE_DOCK", "_NET_WM_WINDOW_TYPE_DESKTOP")
+
+class X11Backend:
+    """
+    Dims and undims client windows on X11.
+    """
+
+    def __init__(self, display_name=None):
+        """
+        Initialize the X11Backend.
+
+        Args:
+            display_name (str): The X display to connect to. Defaults to the DISPLAY environment variable.
+
+        Raises:
+            Xlib.error.DisplayError: If the display name is invalid or the X server cannot be reached.
+            Xlib.error.ConnectionClosedError: If the X server closes the connection while connecting.
+
+        Returns:
+            None
+        """
+        # Connect to the X server
+        self.display_name = display_name
+        self.display = display.Display(display_name)
+        self.root = self.display.screen().root
+
+        # Intern the atoms used to track and dim windows
+        self.NET_ACTIVE_WINDOW = self.display.intern_atom("_NET_ACTIVE_WINDOW")
+        self.NET_CLIENT_LIST = self.display.intern_atom("_NET_CLIENT_LIST")
+        self.NET_WM_WINDOW_OPACITY = self.display.intern_atom("_NET_WM_WINDOW_OPACITY")
+        self.NET_WM_WINDOW_TYPE = self.display.intern_atom("_NET_WM_WINDOW_TYPE")
+        self.skipped_window_types = set(self.display.intern_atom(name) for name in SKIPPED_WINDOW_TYPES)
+
+        # Ignore errors for windows that are destroyed while a batch is in flight
+        self.bad_window = error.CatchError(error.BadWindow)
+
+        # Cached copies of the root window properties, kept up to date by PropertyNotify events
+        self.active_window = 0
+        self.client_windows = []
+
+        # Client windows that should never be dimmed
+        self.skipped_windows = set()
+
+        # The opacity Focus has set on each dimmed window, so that unchanged windows are not sent again
+        self.window_opacity = {}
+
+        self.callback = None
+        self.notifier = None
+
+    def start(self, callback):
+        """
+        Start watching for active window changes.
+
+        Args:
+            callback (callable): Called with no arguments whenever the active window or the client list changes.
+
+        Returns:
+            None
+        """
+        self.callback = callback
+
+        # Ask for PropertyNotify events on the root window before reading the properties so no change is missed
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self.read_client_list()
+        self.read_active_window()
+
+        # Let the Qt event loop tell us when the X connection has events to read
+        self.notifier = QSocketNotifier(self.display.fileno(), QSocketNotifier.Type.Read)
+        self.notifier.activated.connect(self.process_events)
+
+    def process_events(self):
+        """
+        Handle every queued X event and notify the app if the active window or the client list changed.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        changed = False
+
+        try:
+            # Property reads are round trips that can queue more events, so keep going until the queue is empty
+            while self.display.pending_events():
+                event = self.display.next_event()
+
+                if event.type == X.PropertyNotify and event.window == self.root:
+                    if event.atom == self.NET_ACTIVE_WINDOW:
+                        changed = self.read_active_window() or changed
+                    elif event.atom == self.NET_CLIENT_LIST:
+                        changed = self.read_client_list() or changed
+        except CONNECTION_ERRORS as e:
+            exit_on_connection_error(self.display_name, e)
+
+        if changed and self.callback is not None:
+            self.callback()
+
+    def read_active_window(self):
+        """
+        Read _NET_ACTIVE_WINDOW from the root window.
+
+        Args:
+            None
+
+        Returns:
+            bool: True if the active window changed.
+        """
+        prop = self.root.get_full_property(self.NET_ACTIVE_WINDOW, Xatom.WINDOW)
+        active_window = prop.value[0] if prop is not None and len(prop.value) > 0 else 0
+
+        if active_window == self.active_window:
+            return False
+
+        #print("Active window changed (window: " + hex(active_window) + ")")
+
+        self.active_window = active_window
+        return True
+
+    def read_client_list(self):
+        """
+        Read _NET_CLIENT_LIST from the root window and look up the type of any new windows.
+
+        Args:
+            None
+
+        Returns:
+            bool: True if the client list changed.
+        """
+        prop = self.root.get_full_property(self.NET_CLIENT_LIST, Xatom.WINDOW)
+        client_windows = list(prop.value) if prop is not None else []
+
+        if client_windows == self.client_windows:
+            return False
+
+        known_windows = set(self.client_windows)
+        current_windows = set(client_windows)
+
+        # Look up the window type once per window, when it first appears
+        for wid in current_windows - known_windows:
+            if self.is_skipped_window(wid):
+                self.skipped_windows.add(wid)
+
+        # Forget windows that have gone away
+        self.skipped_windows &= current_windows
+        for wid in known_windows - current_windows:
+            self.window_opacity.pop(wid, None)
+
+        self.client_windows = client_windows
+        return True
+
+    def is_skipped_window(self, wid):
+        """
+        Check whether a window is a dock or desktop window that should never be dimmed.
+
+        Args:
+            wid (int): The window id.
+
+        Returns:
+            bool: True if the window should be skipped.
+        """
+        window = self.display.create_resource_object("window", wid)
+
+        try:
+            prop = window.get_full_property(self.NET_WM_WINDOW_TYPE, Xatom.ATOM)
+        except error.BadWindow:
+            return False
+
+        return prop is not None and any(atom in self.skipped_window_types for atom in prop.value)
+
+    def set_opacity(self, wid, opacity):
+        """
+        Queue an opacity change for a window without flushing it.
+
+        Args:
+            wid (int): The window id.
+            opacity (int): The opacity as a _NET_WM_WINDOW_OPACITY value, or None to remove it.
+
+        Returns:
+            None
+        """
+        window = self.display.create_resource_object("window", wid)
+
+        if opacity is None:
+            window.delete_property(self.NET_WM_WINDOW_OPACITY, onerror=self.bad_window)
+            self.window_opacity.pop(wid, None)
+        else:
+            window.change_property(self.NET_WM_WINDOW_OPACITY, Xatom.CARDINAL, 32, [opacity], onerror=self.bad_window)
+            self.window_opacity[wid] = opacity
+
+    def commit(self):
+        """
+        Send every queued change in one flush and wait for the server to process them.
+
+        Args:
+            None
+
+        Raises:
+            Xlib.error.ConnectionClosedError: If the X server has closed the connection. The callers in this class
+                catch it and exit with a readable error.
+
+        Returns:
+            None
+        """
+        self.display.sync()
+
+        # The round trip may have read events that the socket notifier will not report again
+        if self.display.pending_events():
+            QTimer.singleShot(0, self.process_events)
+
+    def dim_inactive_windows(self, tint, transparency_dim, transparency_default):
+        """
+        Dim every client window except the active window.
+
+        Dock and desktop windows are skipped. Tinting is not supported by _NET_WM_WINDOW_OPACITY.
+
+        Args:
+            tint (int): Unused.
+            transparency_dim (int): The transparency of inactive windows. (Range: 0 to 255)
+            transparency_default (int): Unused. The active window has its opacity property removed instead.
+
+        Returns:
+            None
+        """
+        opacity_dim = transparency_dim * OPACITY_MAX // 255
+        changed = False
+
+        try:
+            for wid in self.client_windows:
+                # Leave the active window, docks and desktops at their normal opacity
+                if wid == self.active_window or wid in self.skipped_windows:
+                    opacity = None
+                else:
+                    opacity = opacity_dim
+
+                # Only send windows whose opacity actually changes
+                if self.window_opacity.get(wid) != opacity:
+                    self.set_opacity(wid, opacity)
+                    changed = True
+
+            if changed:
+                self.commit()
+        except CONNECTION_ERRORS as e:
+            exit_on_connection_error(self.display_name, e)
+
+    def shutdown(self, timeout):
+        """
+        Wait for deferred changes before exiting. Every change is sent synchronously on X11, so there are none.
+
+        Args:
+            timeout (float): Unused.
+
+        Returns:
+            bool: Always True.
+        """
+        return True
+
+    def undim_all_windows(self, tint, transparency_default):
+        """
+        Remove the opacity property from every window Focus has dimmed.
+
+        Args:
+            tint (int): Unused.
+            transparency_default (int): Unused. The opacity property is removed instead.
+
+        Returns:
+            None
+        """
+        if self.window_opacity:
+            try:
+                for wid in list(self.window_opacity):
+                    self.set_opacity(wid, None)
+
+                self.commit()
+            except CONNECTION_ERRORS as e:
+                exit_on_connection_error(self.display_name, e)
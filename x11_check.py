@@ -0,0 +1,208 @@
+"""
+Xvfb check for the X11 backend.
+
+Starts X11Backend against an X display, by default a private Xvfb server started for the check. The check plays
+the part of the window manager: it creates client windows and sets _NET_CLIENT_LIST and _NET_ACTIVE_WINDOW on the
+root window. It then checks that inactive clients get _NET_WM_WINDOW_OPACITY, that the active client does not, and
+that a pass with nothing to change sends no requests to the X server.
+
+Run `python x11_check.py`, or `python x11_check.py --display :1` to use an X server that is already running.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from PyQt6.QtCore import QCoreApplication
+from Xlib import X, Xatom, display
+
+from x11_backend import CONNECTION_ERRORS, OPACITY_MAX, X11Backend
+
+# How long to wait for the backend to see a property change
+EVENT_TIMEOUT_SECONDS = 5.0
+
+def start_xvfb():
+    """
+    Start a private Xvfb server on a free display number.
+
+    Args:
+        None
+
+    Returns:
+        tuple: The Xvfb process and its display name.
+    """
+    # Xvfb picks a free display number and writes it to the pipe once it is ready for connections
+    read_fd, write_fd = os.pipe()
+    xvfb = subprocess.Popen(["Xvfb", "-displayfd", str(write_fd), "-nolisten", "tcp", "-screen", "0", "640x480x24"],
+                            pass_fds=(write_fd,))
+    os.close(write_fd)
+
+    with os.fdopen(read_fd) as display_fd:
+        display_number = display_fd.readline().strip()
+
+    if not display_number:
+        xvfb.wait()
+        raise RuntimeError("Xvfb exited before it was ready (exit code: " + str(xvfb.returncode) + ")")
+
+    return xvfb, ":" + display_number
+
+def wait_for_active(backend, passes, wid):
+    """
+    Process the backend's X events until it has run a dim pass for a given active window.
+
+    Args:
+        backend (X11Backend): The backend under test.
+        passes (list): The active window of each pass, appended to by the backend callback.
+        wid (int): The window id the pass should see as active.
+
+    Returns:
+        bool: True if the pass happened before the timeout.
+    """
+    deadline = time.monotonic() + EVENT_TIMEOUT_SECONDS
+
+    # The client list and the active window can arrive in separate reads, so wait for the pass that sees both
+    while (not passes or passes[-1] != wid) and time.monotonic() < deadline:
+        backend.process_events()
+        time.sleep(0.01)
+
+    return len(passes) > 0 and passes[-1] == wid
+
+def run_check(display_name):
+    """
+    Run the X11 backend against a display and check the opacity it sets.
+
+    Args:
+        display_name (str): The X display to use.
+
+    Returns:
+        bool: True if every check passed.
+    """
+    # QSocketNotifier needs a Qt application, even though the check reads the events itself
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+
+    # Use a separate connection as the window manager
+    wm = display.Display(display_name)
+    root = wm.screen().root
+    NET_ACTIVE_WINDOW = wm.intern_atom("_NET_ACTIVE_WINDOW")
+    NET_CLIENT_LIST = wm.intern_atom("_NET_CLIENT_LIST")
+    NET_WM_WINDOW_OPACITY = wm.intern_atom("_NET_WM_WINDOW_OPACITY")
+
+    clients = [root.create_window(0, 0, 100, 100, 0, X.CopyFromParent) for _ in range(3)]
+    client_ids = [client.id for client in clients]
+    wm.sync()
+
+    transparency_dim = 128
+    opacity_dim = transparency_dim * OPACITY_MAX // 255
+
+    backend = X11Backend(display_name)
+    passes = []
+
+    def dim_pass():
+        passes.append(backend.active_window)
+        backend.dim_inactive_windows(0, transparency_dim, 255)
+
+    backend.start(dim_pass)
+
+    def set_active(client_id):
+        root.change_property(NET_ACTIVE_WINDOW, Xatom.WINDOW, 32, [client_id])
+        wm.sync()
+
+    def opacity_of(client):
+        prop = client.get_full_property(NET_WM_WINDOW_OPACITY, Xatom.CARDINAL)
+        return prop.value[0] if prop is not None else None
+
+    def check_opacity(active):
+        ok = True
+        for client in clients:
+            expected = None if client.id == active else opacity_dim
+            actual = opacity_of(client)
+            if actual != expected:
+                print("FAIL: window " + hex(client.id) + " has opacity " + str(actual) + ", expected " + str(expected))
+                ok = False
+        return ok
+
+    ok = True
+
+    # Map the clients and make the first one active
+    root.change_property(NET_CLIENT_LIST, Xatom.WINDOW, 32, client_ids)
+    set_active(client_ids[0])
+
+    if not wait_for_active(backend, passes, client_ids[0]):
+        print("FAIL: the backend did not see the first active window")
+        return False
+
+    ok = check_opacity(client_ids[0]) and ok
+
+    # A pass with nothing to change must not send any requests
+    serial = backend.display.display.request_serial
+    backend.dim_inactive_windows(0, transparency_dim, 255)
+    if backend.display.display.request_serial != serial:
+        print("FAIL: a pass with no changes sent " + str(backend.display.display.request_serial - serial) + " requests")
+        ok = False
+
+    # Moving the focus undims the new active window and dims the old one
+    set_active(client_ids[1])
+
+    if not wait_for_active(backend, passes, client_ids[1]):
+        print("FAIL: the backend did not see the active window change")
+        return False
+
+    ok = check_opacity(client_ids[1]) and ok
+
+    # Undimming removes the property from every window
+    backend.undim_all_windows(0, 255)
+    for client in clients:
+        if opacity_of(client) is not None:
+            print("FAIL: window " + hex(client.id) + " still has an opacity after undimming")
+            ok = False
+
+    wm.close()
+    app.quit()
+
+    return ok
+
+def main():
+    """
+    Parse the command line, start Xvfb if needed and run the check.
+
+    Args:
+        None
+
+    Returns:
+        int: The exit code. 0 if every check passed, otherwise 1.
+    """
+    parser = argparse.ArgumentParser(description="Check the X11 backend against an X server such as Xvfb.")
+    parser.add_argument("--display", help="X display to use instead of starting a private Xvfb server")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    xvfb = None
+    display_name = args.display
+
+    if display_name is None:
+        try:
+            xvfb, display_name = start_xvfb()
+        except (OSError, RuntimeError) as e:
+            print("Error starting Xvfb: " + str(e))
+            print("Install Xvfb, or pass --display to use an X server that is already running.")
+            return 1
+
+    try:
+        print("Checking the X11 backend on display " + display_name)
+        passed = run_check(display_name)
+    except CONNECTION_ERRORS as e:
+        print("Error connecting to the X server at display: " + display_name)
+        print("Error: " + str(e))
+        passed = False
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    print("PASS" if passed else "FAIL")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())